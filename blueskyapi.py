@@ -1,9 +1,27 @@
 import time
 import os
+import sys
 import csv
+import struct
+import signal
 import multiprocessing
+from queue import Empty
+from multiprocessing import shared_memory
 from datetime import datetime
-from atproto import FirehoseSubscribeReposClient, parse_subscribe_repos_message, CAR, IdResolver, DidInMemoryCache
+from atproto import parse_subscribe_repos_message, IdResolver
+
+try:
+    from atproto_subscription.frames import Frame
+except ImportError:  # older atproto releases
+    from atproto_firehose.models import Frame
+
+# Shared firehose helpers live next to the services in proj-dev/app/live_demo
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "proj-dev", "app", "live_demo"))
+from firehose_utils import (
+    CursorCheckpoint, LexiconPrefilter, DEFAULT_EXTRA_TERMS, prefilter_stats, DidHandleCache, resolve_handles,
+    extract_post_records, RecordFilter, record_filter_stats, RECORD_FILTER_RULES
+)
+from firehose_replay import RawFrameClient, ReplayClient
 
 # ==============================================================================
 # Internal Helper Functions
@@ -51,78 +69,418 @@ def _extract_post_data(record, repo, path, author_handle):
         'reply_to': reply_to
     }
 
-def _process_post(commit, op, resolver, data_callback, keyword=None):
+def _process_post(commit, op, record, data_callback, keyword=None, prefilter=None, record_filter=None):
     """
-    Process a single post operation with optional keyword filtering.
+    Process a single post record with optional record-level, keyword and
+    disaster-lexicon filtering.
     Once the post data is extracted, call `data_callback(post_data)`
     so the user can handle/save the data however they choose.
+    The author is still the DID at this point, see `_resolve_pending`.
     """
     try:
-        author_handle = _resolve_author_handle(commit.repo, resolver)
-        car = CAR.from_bytes(commit.blocks)
-        for record in car.blocks.values():
-            if isinstance(record, dict) and record.get('$type') == 'app.bsky.feed.post':
-                post_data = _extract_post_data(record, commit.repo, op.path, author_handle)
+        # Language, length and reply/quote rules come first, they are the cheapest
+        if record_filter and not record_filter.check(record):
+            return
+
+        if prefilter and not prefilter.match(record.get('text', '')):
+            return
 
-                # Filter based on keyword (case-insensitive)
-                if keyword and keyword.lower() not in post_data['text'].lower():
-                    continue  # Skip this post if it doesn't contain the keyword
+        post_data = _extract_post_data(record, commit.repo, op.path, commit.repo)
 
-                # Pass the post data to the user-defined callback
-                data_callback(post_data)
+        # Filter based on keyword (case-insensitive)
+        if keyword and keyword.lower() not in post_data['text'].lower():
+            return  # Skip this post if it doesn't contain the keyword
+
+        # Pass the post data to the user-defined callback
+        data_callback(post_data)
 
     except Exception as e:
         print(f"Error processing record: {e}")
 
-def process_message(message, resolver, data_callback, keyword=None):
+def process_message(message, data_callback, keyword=None, prefilter=None, check_raw=True, record_filter=None):
     """
-    Process a single message from the firehose, filtering posts if a keyword is specified.
+    Process a single message from the firehose, filtering posts if a keyword,
+    a disaster-lexicon prefilter or a `RecordFilter` is specified.
     Once a valid post is found, calls `data_callback(post_data)`.
+    Pass check_raw=False if the raw frame already went through the prefilter.
+    Returns the message's sequence number, or None if it couldn't be parsed.
     """
     try:
         commit = parse_subscribe_repos_message(message)
-        if not hasattr(commit, 'ops'):
-            return
-
-        for op in commit.ops:
-            if op.action == 'create' and op.path.startswith('app.bsky.feed.post/'):
-                _process_post(commit, op, resolver, data_callback, keyword)
+        post_ops = [
+            op for op in getattr(commit, 'ops', None) or []
+            if op.action == 'create' and op.path.startswith('app.bsky.feed.post/')
+        ]
+        # Skip the CAR decode entirely if the raw blocks contain no disaster term
+        if post_ops and (prefilter is None or not check_raw or prefilter.match_bytes(commit.blocks)):
+            # The CAR is decoded once per commit and shared by all of its ops
+            for op, record in extract_post_records(commit.blocks, post_ops):
+                _process_post(commit, op, record, data_callback, keyword, prefilter, record_filter)
+        return getattr(commit, 'seq', None)
 
     except Exception as e:
         print(f"Error processing message: {e}")
 
+# ==============================================================================
+# Shared-Memory Frame Transport
+# ==============================================================================
+
+FULL_POLICIES = ('block', 'drop-oldest', 'drop-newest')
+
+# Indices into SharedFrameRing.state
+_WRITE, _READ, _PRODUCED, _CONSUMED, _DROPPED, _OVERSIZE, _PRODUCER_WAITING = range(7)
+
+class SharedFrameRing:
+    """
+    Fixed-size ring buffer of raw firehose frames in shared memory.
+
+    Each of the `slots` slots holds one frame as a 4-byte length prefix plus
+    the frame bytes, so frames larger than `slot_size - 4` are dropped and
+    counted as oversize. The client process `put`s frames, workers `get` a
+    (slot, memoryview) pair that points straight into shared memory and must
+    `release` the slot once they're done with it. A slot is marked with the
+    worker number that claimed it, so the slots of a worker that died before
+    releasing them can be freed with `release_owner`. Waiting is done on
+    semaphores rather than a Condition, whose notify() hangs for good once
+    a process died while waiting on it.
+
+    Workers pass the sequence number of each processed frame to `release`,
+    `checkpoint_seq` turns them into a cursor that is safe to resume from.
+
+    `full_policy` decides what happens when the ring is full:
+        'block'       - the producer waits for a free slot
+        'drop-oldest' - the oldest unread frame is discarded
+        'drop-newest' - the incoming frame is discarded
+    """
+    def __init__(self, slots=2048, slot_size=32 * 1024, full_policy='block'):
+        if full_policy not in FULL_POLICIES:
+            raise ValueError(f"full_policy must be one of {FULL_POLICIES}, got {full_policy!r}")
+        self.slots = slots
+        self.slot_size = slot_size
+        self.full_policy = full_policy
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        self.buf = self.shm.buf
+
+        # Everything below is guarded by the lock
+        self.lock = multiprocessing.Lock()
+        self.state = multiprocessing.RawArray('q', 7)
+        self.busy = multiprocessing.RawArray('i', slots)  # 0 = free, else the owning worker's number
+        self.enqueued_at = multiprocessing.RawArray('d', slots)
+        self.lag = multiprocessing.RawArray('d', 2)  # last, max seconds a frame waited
+        # Ring position last claimed from each slot, and its frame's seq once released (0 = unknown)
+        self.claimed = multiprocessing.RawArray('q', slots)
+        self.done_seq = multiprocessing.RawArray('q', slots)
+        # One release per written frame, and a wakeup for a producer blocked on a full ring
+        self.frames = multiprocessing.Semaphore(0)
+        self.space = multiprocessing.Semaphore(0)
+
+    def __getstate__(self):
+        # memoryviews can't be pickled, reattach to the segment on the other side
+        state = self.__dict__.copy()
+        del state['buf']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.buf = self.shm.buf
+
+    def put(self, data):
+        """Copy a frame into the ring. Returns False if the frame was dropped."""
+        size = len(data)
+        self.lock.acquire()
+        try:
+            # Every frame offered counts, so produced - dropped is what entered the ring under any policy
+            self.state[_PRODUCED] += 1
+            if size + 4 > self.slot_size:
+                self.state[_OVERSIZE] += 1
+                self.state[_DROPPED] += 1
+                return False
+
+            while True:
+                full = self.state[_WRITE] - self.state[_READ] >= self.slots
+                slot = self.state[_WRITE] % self.slots
+                if not full and not self.busy[slot]:
+                    break
+                if self.full_policy == 'block':
+                    self.state[_PRODUCER_WAITING] = 1
+                    self.lock.release()
+                    try:
+                        self.space.acquire(True, 1)
+                    finally:
+                        self.lock.acquire()
+                elif self.full_policy == 'drop-oldest' and full:
+                    self.state[_READ] += 1
+                    self.state[_DROPPED] += 1
+                else:
+                    # drop-newest, or drop-oldest while a worker still reads the target slot
+                    self.state[_DROPPED] += 1
+                    return False
+
+            offset = slot * self.slot_size
+            struct.pack_into('<I', self.buf, offset, size)
+            self.buf[offset + 4:offset + 4 + size] = data
+            self.enqueued_at[slot] = time.time()
+            self.state[_WRITE] += 1
+        finally:
+            self.lock.release()
+        self.frames.release()
+        return True
+
+    def _wake_producer(self):
+        """Wake a producer blocked on a full ring, the lock must be held."""
+        if self.state[_PRODUCER_WAITING]:
+            self.state[_PRODUCER_WAITING] = 0
+            self.space.release()
+
+    def get(self, timeout=None, owner=1):
+        """
+        Claim the oldest unread frame for worker number `owner` (> 0). Returns
+        (slot, memoryview) or None on timeout. The view is only valid until
+        `release(slot)`.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            # A release can outlive its frame (drop-oldest discards unread frames),
+            # so the ring is checked after every wakeup and once more on timeout
+            woken = self.frames.acquire(True, None if deadline is None else max(deadline - time.time(), 0))
+            with self.lock:
+                if self.state[_WRITE] > self.state[_READ]:
+                    slot = self.state[_READ] % self.slots
+                    self.busy[slot] = owner
+                    self.claimed[slot] = self.state[_READ]
+                    self.done_seq[slot] = 0
+                    self.state[_READ] += 1
+                    self.state[_CONSUMED] += 1
+                    self.lag[0] = time.time() - self.enqueued_at[slot]
+                    self.lag[1] = max(self.lag[1], self.lag[0])
+                    self._wake_producer()
+                    break
+            if not woken:
+                return None
+
+        offset = slot * self.slot_size
+        size = struct.unpack_from('<I', self.buf, offset)[0]
+        return slot, self.buf[offset + 4:offset + 4 + size]
+
+    def release(self, slot, seq=None):
+        """Free a slot, `seq` is the sequence number of its frame if it is known."""
+        with self.lock:
+            self.busy[slot] = 0
+            self.done_seq[slot] = seq or 0
+            self._wake_producer()
+
+    def checkpoint_seq(self):
+        """
+        Sequence number of the newest processed frame that has no unread or
+        in-flight frame before it, 0 if none is known. Resuming from it loses
+        nothing still in the ring or with a slower worker.
+        """
+        with self.lock:
+            low = self.state[_READ]
+            for slot in range(self.slots):
+                if self.busy[slot]:
+                    low = min(low, self.claimed[slot])
+            # Frames rejected by the prefilter have no seq, so look further back
+            for position in range(low - 1, max(low - 1 - self.slots, -1), -1):
+                slot = position % self.slots
+                if self.claimed[slot] == position and self.done_seq[slot]:
+                    return self.done_seq[slot]
+        return 0
+
+    def release_owner(self, owner):
+        """Free every slot claimed by worker number `owner`, after it died. Returns how many."""
+        with self.lock:
+            slots = [slot for slot in range(self.slots) if self.busy[slot] == owner]
+            for slot in slots:
+                self.busy[slot] = 0
+            if slots:
+                self._wake_producer()
+        return len(slots)
+
+    def pending(self):
+        """Frames that are unread or still being processed by a worker."""
+        with self.lock:
+            return self.state[_WRITE] - self.state[_READ] + sum(1 for owner in self.busy if owner)
+
+    def stats(self):
+        """
+        Ring counters. `produced` counts every frame passed to put and
+        `dropped` every one discarded, oversize or by the full policy.
+        """
+        with self.lock:
+            return {
+                'produced': self.state[_PRODUCED],
+                'consumed': self.state[_CONSUMED],
+                'dropped': self.state[_DROPPED],
+                'oversize': self.state[_OVERSIZE],
+                'occupancy': self.state[_WRITE] - self.state[_READ],
+                'capacity': self.slots,
+                'last_lag_seconds': round(self.lag[0], 4),
+                'max_lag_seconds': round(self.lag[1], 4),
+            }
+
+    def close(self, unlink=False):
+        self.buf.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
 # ==============================================================================
 # Worker / Client Processes
 # ==============================================================================
 
-def worker_process(queue, resolver, data_callback, stop_event, keyword):
+def _publish_counts(local_counts, shared_counts, published):
+    """Add the counter increments since the last call to the shared array."""
+    with shared_counts.get_lock():
+        for i, value in enumerate(local_counts):
+            shared_counts[i] += value - published[i]
+            published[i] = value
+
+def _resolve_pending(pending, resolver, handle_cache, data_callback, batch_callback=None, max_workers=8):
+    """
+    Resolve the authors of a batch of accepted posts in one go and hand the
+    posts to `batch_callback` as one list, or to `data_callback` one by one.
+    Cached DIDs never touch the network, the rest are resolved concurrently.
+    """
+    handles = resolve_handles(
+        [post_data['author'] for post_data in pending],
+        lambda did: _resolve_author_handle(did, resolver),
+        handle_cache,
+        max_workers
+    )
+    for post_data in pending:
+        post_data['author'] = handles.get(post_data['author'], post_data['author'])
+    if batch_callback:
+        batch_callback(list(pending))
+    else:
+        for post_data in pending:
+            data_callback(post_data)
+    pending.clear()
+
+def _process_frame(view, data_callback, keyword=None, prefilter=None, record_filter=None):
     """
-    Worker process that continually pulls messages off the queue
+    Decode and process one raw frame read from the ring.
+    The prefilter scans the shared-memory view in place, the frame is only
+    copied out (the CBOR decoder needs real bytes) once it passed.
+    """
+    if prefilter and not prefilter.match_bytes(view):
+        return None
+    message = Frame.from_bytes(bytes(view))
+    return process_message(message, data_callback, keyword, prefilter, check_raw=False,
+                           record_filter=record_filter)
+
+def worker_process(ring, resolver, data_callback, stop_event, keyword, last_seq,
+                   prefilter=None, filter_counts=None, handle_cache=None,
+                   resolve_batch_size=50, resolve_interval=1.0, batch_callback=None,
+                   record_filter=None, record_counts=None, worker_id=1):
+    """
+    Worker process that continually pulls frames off the shared ring
     and processes them. Terminates when 'stop_event' is set.
+    Slots are claimed as `worker_id` and released even if processing fails.
+    Accepted posts are held back until `resolve_batch_size` of them are
+    pending or `resolve_interval` seconds passed, then their author handles
+    are resolved as one batch and delivered to the callback.
+    The highest processed sequence number is published in `last_seq`, and
+    every frame's own one goes back to the ring with its slot, which the
+    saved and the reconnect cursor come from (see SharedFrameRing.checkpoint_seq). The
+    prefilter and record filter counters are added to `filter_counts` and
+    `record_counts` about once a second.
     """
+    # The parent coordinates shutdown through stop_event, so Ctrl+C doesn't
+    # kill the worker before its pending posts are delivered
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    flush_if_due = getattr(batch_callback, 'flush_if_due', None)
+
+    published = [0] * 4
+    published_records = [0] * (len(RECORD_FILTER_RULES) + 1)
+    last_publish = time.time()
+    pending = []
+    first_pending_at = None
     while not stop_event.is_set():
         try:
-            message = queue.get(timeout=1)
-            process_message(message, resolver, data_callback, keyword)
-        except multiprocessing.queues.Empty:
-            continue
+            item = ring.get(timeout=resolve_interval, owner=worker_id)
+            if item is None:
+                continue
+            slot, view = item
+            seq = None
+            try:
+                seq = _process_frame(view, pending.append, keyword, prefilter, record_filter)
+            finally:
+                view.release()
+                ring.release(slot, seq)
+            if seq is not None and seq > last_seq.value:
+                with last_seq.get_lock():
+                    last_seq.value = max(last_seq.value, seq)
         except Exception as e:
             print(f"Worker error: {e}")
-
-def client_process(queue, stop_event):
+        finally:
+            if pending and first_pending_at is None:
+                first_pending_at = time.time()
+            if pending and (len(pending) >= resolve_batch_size
+                            or time.time() - first_pending_at >= resolve_interval):
+                try:
+                    _resolve_pending(pending, resolver, handle_cache, data_callback, batch_callback)
+                except Exception as e:
+                    print(f"Handle resolution error: {e}")
+                    pending.clear()
+                first_pending_at = None
+            if flush_if_due:
+                flush_if_due()
+            if time.time() - last_publish >= 1:
+                if prefilter and filter_counts is not None:
+                    _publish_counts(prefilter.counts, filter_counts, published)
+                if record_filter and record_counts is not None:
+                    _publish_counts(record_filter.counts, record_counts, published_records)
+                last_publish = time.time()
+
+    # Deliver whatever is left before exiting
+    try:
+        if pending:
+            _resolve_pending(pending, resolver, handle_cache, data_callback, batch_callback)
+        if hasattr(batch_callback, 'flush'):
+            batch_callback.flush()
+    except Exception as e:
+        print(f"Worker shutdown error: {e}")
+    if prefilter and filter_counts is not None:
+        _publish_counts(prefilter.counts, filter_counts, published)
+    if record_filter and record_counts is not None:
+        _publish_counts(record_filter.counts, record_counts, published_records)
+
+def client_process(ring, stop_event, start_cursor=None, checkpointing=False, cursor_refresh=1000,
+                   replay_file=None, replay_speed=1.0):
     """
-    The client process that subscribes to the Firehose and places
-    incoming messages onto the multiprocessing queue.
+    The client process that subscribes to the Firehose and copies the raw
+    bytes of every incoming frame into the shared ring. Decoding is left to
+    the workers.
+    If `start_cursor` is given the stream is replayed from that sequence number.
+    With `checkpointing` every reconnect resumes from the ring's
+    checkpoint_seq, the same cursor that is saved, even if the client was
+    started at the live head.
+    If `replay_file` is given the frames come from that recording instead of
+    the network (see firehose_replay.py) and the process exits at its end.
     """
-    client = FirehoseSubscribeReposClient()
-    def message_handler(message):
+    params = {'cursor': start_cursor} if start_cursor is not None else None
+    received = 0
+    def frame_handler(raw_frame):
+        nonlocal received
         if stop_event.is_set():
             client.stop()
             return
-        queue.put(message)
-
+        ring.put(raw_frame)
+
+        # Otherwise a reconnect would rewind to start_cursor, or skip the outage at the live head
+        received += 1
+        if checkpointing and received % cursor_refresh == 0:
+            seq = ring.checkpoint_seq()
+            if seq:
+                client.update_params({'cursor': seq})
+
+    if replay_file:
+        client = ReplayClient(replay_file, replay_speed, on_raw_frame=frame_handler)
+    else:
+        client = RawFrameClient(frame_handler, params)
     try:
-        client.start(message_handler)
+        client.start(lambda message: None)
     except Exception as e:
         if not stop_event.is_set():
             print(f"Client process error: {e}")
@@ -138,11 +496,27 @@ class FirehoseScraper:
     Usage:
         1. Instantiate with desired parameters:
            scraper = FirehoseScraper(num_workers=4, keyword="dog")
+           Frames travel from the client to the workers through a shared-memory
+           ring (ring_slots x slot_size bytes), full_policy is one of
+           'block', 'drop-oldest' or 'drop-newest'.
+           Pass cursor_file="cursor.json" to checkpoint the stream position
+           and resume from it after a restart, and disaster_prefilter=True to
+           drop posts without disaster vocabulary before any decoding.
+           langs=['en'], min_text_length, drop_replies and drop_quotes
+           reject records the downstream pipeline can't use before any
+           other work, see record_filter_stats().
+           Pass replay_file="frames.bin.gz" to play a recording made with
+           firehose_replay.py instead of the live stream, replay_speed scales
+           its timing (None replays as fast as possible). Collection stops
+           once the recording is fully processed.
         2. Define a data_callback function to handle each post:
            def my_callback(post_data):
                # store in DB, write to CSV, etc.
+           or a batch_callback that receives lists of posts, e.g. the
+           buffered single-writer CSV sink from csv_sink_factory().
         3. Start indefinitely:
            scraper.start_collection(data_callback=my_callback)
+           scraper.start_collection(batch_callback=csv_sink_factory("posts.csv"))
 
         The collection continues until you kill the process (Ctrl+C) or call 
         `scraper.stop_collection()` from your code.
@@ -151,21 +525,69 @@ class FirehoseScraper:
         self,
         num_workers=4,
         keyword=None, 
-        verbose=False
+        verbose=False,
+        cursor_file=None,
+        checkpoint_every=1000,
+        checkpoint_interval=5.0,
+        max_catchup_seconds=3600,
+        disaster_prefilter=False,
+        extra_terms=DEFAULT_EXTRA_TERMS,
+        langs=None,
+        min_text_length=0,
+        drop_replies=False,
+        drop_quotes=False,
+        did_cache_file="did_handles.sqlite",
+        did_cache_ttl=86400,
+        resolve_batch_size=50,
+        resolve_interval=1.0,
+        ring_slots=2048,
+        slot_size=32 * 1024,
+        full_policy='block',
+        replay_file=None,
+        replay_speed=1.0
     ):
         self.num_workers = num_workers
         self.keyword = keyword
         self.verbose = verbose
-        self.queue = multiprocessing.Queue()
+        self.ring_config = (ring_slots, slot_size, full_policy)
+        self.ring = None
         self.workers = []
         self.stop_event = multiprocessing.Event()
         self.client_proc = None
+        self.replay = (replay_file, replay_speed)
+
+        # Furthest stream position any worker reached; checkpoints come from the ring instead
+        self.last_seq = multiprocessing.Value('q', 0)
+        self.checkpoint = None
+        # A replay must not overwrite the live stream's checkpoint
+        if cursor_file and not replay_file:
+            self.checkpoint = CursorCheckpoint(
+                cursor_file,
+                every_n=checkpoint_every,
+                every_seconds=checkpoint_interval,
+                max_catchup_seconds=max_catchup_seconds
+            )
 
-        # For DID resolution
-        self.cache = DidInMemoryCache()
-        self.resolver = IdResolver(cache=self.cache)
-
-    def start_collection(self, data_callback):
+        # Disaster-lexicon prefilter, every worker counts into filter_counts
+        self.prefilter = LexiconPrefilter(extra_terms) if disaster_prefilter else None
+        self.filter_counts = multiprocessing.Array('q', 4)
+
+        # Record-level filter, only built if any of its rules is enabled
+        self.record_filter = None
+        if langs or min_text_length or drop_replies or drop_quotes:
+            self.record_filter = RecordFilter(langs, min_text_length, drop_replies, drop_quotes)
+        self.record_counts = multiprocessing.Array('q', len(RECORD_FILTER_RULES) + 1)
+
+        # For DID resolution, deferred until a post is accepted and batched per worker.
+        # The on-disk cache is shared by all workers and survives restarts.
+        self.resolver = IdResolver()
+        self.handle_cache = DidHandleCache(did_cache_file, did_cache_ttl)
+        self.resolve_batch_size = resolve_batch_size
+        self.resolve_interval = resolve_interval
+        self.data_callback = None
+        self.batch_callback = None
+
+    def start_collection(self, data_callback=None, batch_callback=None):
         """
         Start collecting posts. This method will run indefinitely unless 
         stopped by user interrupt (Ctrl+C) or by calling `stop_collection()`.
@@ -173,41 +595,62 @@ class FirehoseScraper:
         Args:
             data_callback (callable): Function that takes a single argument (post_data dict)
                                       and handles/stores that data. 
+            batch_callback (callable): Function that takes a list of post_data dicts.
+                                       Used instead of data_callback if given. If it has
+                                       `flush_if_due()`/`flush()` methods, workers call them
+                                       on every loop and before exiting.
         """
+        if data_callback is None and batch_callback is None:
+            raise ValueError("Either data_callback or batch_callback is required")
+        self.data_callback = data_callback
+        self.batch_callback = batch_callback
+        if isinstance(batch_callback, SinkProcess):
+            batch_callback.start()
+
         print("Starting firehose collection...")
         if self.keyword:
             print(f"Filtering posts that contain the keyword: '{self.keyword}'")
-
-        # Start worker processes
-        for _ in range(self.num_workers):
-            p = multiprocessing.Process(
-                target=worker_process,
-                args=(
-                    self.queue,
-                    self.resolver,
-                    data_callback,
-                    self.stop_event,
-                    self.keyword
-                )
-            )
-            p.start()
-            self.workers.append(p)
+        if self.prefilter:
+            print(f"Prefiltering posts against {len(self.prefilter.terms)} disaster terms")
+        if self.record_filter:
+            print(f"Filtering records (langs={self.record_filter.langs}, "
+                  f"min_text_length={self.record_filter.min_text_length}, "
+                  f"drop_replies={self.record_filter.drop_replies}, drop_quotes={self.record_filter.drop_quotes})")
+        start_cursor = self.checkpoint.load() if self.checkpoint else None
+        self.ring = SharedFrameRing(*self.ring_config)
+
+        # Start worker processes, numbered from 1 as ring slot owners
+        self.workers = [self._start_worker(worker_id) for worker_id in range(1, self.num_workers + 1)]
 
         # Start the client process
         self.client_proc = multiprocessing.Process(
             target=client_process,
-            args=(self.queue, self.stop_event)
+            args=(self.ring, self.stop_event, start_cursor, self.checkpoint is not None, 1000, *self.replay)
         )
         self.client_proc.start()
+        started = time.time()
 
         # Monitor indefinitely
         try:
             while not self.stop_event.is_set():
+                # A finished replay stops once the workers emptied the ring
+                if self.replay[0] and self.client_proc.exitcode == 0:
+                    if self.ring.pending() == 0:
+                        elapsed = time.time() - started
+                        produced = self.ring.stats()['produced']
+                        print(f"\nReplay finished: {produced} frames in {elapsed:.1f}s "
+                              f"({produced / elapsed:.0f} frames/s)")
+                        self.stop_collection()
+                        break
+                    time.sleep(0.1)
+                    continue
                 # If the client process dies unexpectedly, stop everything
                 if not self.client_proc.is_alive():
                     print("\nClient process exited unexpectedly.")
                     self.stop_collection()
                     break
+                self._replace_dead_workers()
+                self._update_checkpoint()
                 time.sleep(1)
         except KeyboardInterrupt:
             print("\nCollection interrupted by user.")
@@ -218,6 +661,49 @@ class FirehoseScraper:
         finally:
             self.stop_collection()
 
+    def _start_worker(self, worker_id):
+        p = multiprocessing.Process(
+            target=worker_process,
+            args=(
+                self.ring,
+                self.resolver,
+                self.data_callback,
+                self.stop_event,
+                self.keyword,
+                self.last_seq,
+                self.prefilter,
+                self.filter_counts,
+                self.handle_cache,
+                self.resolve_batch_size,
+                self.resolve_interval,
+                self.batch_callback,
+                self.record_filter,
+                self.record_counts,
+                worker_id
+            )
+        )
+        p.start()
+        return p
+
+    def _replace_dead_workers(self):
+        """Free the ring slots of workers that died and start replacements."""
+        for i, p in enumerate(self.workers):
+            if p.exitcode is None:
+                continue
+            freed = self.ring.release_owner(i + 1)
+            print(f"\nWorker {i + 1} exited with code {p.exitcode}, freed {freed} ring slots, restarting it.")
+            self.workers[i] = self._start_worker(i + 1)
+
+    def _update_checkpoint(self):
+        """
+        Checkpoint the lowest unprocessed position of the ring rather than the
+        highest seq any worker reached, which would skip frames still queued.
+        """
+        seq = self.ring.checkpoint_seq() if self.ring else 0
+        if self.checkpoint and seq:
+            self.checkpoint.update(seq)
+        return seq
+
     def stop_collection(self):
         """Stop the collection gracefully."""
         if not self.stop_event.is_set():
@@ -228,22 +714,68 @@ class FirehoseScraper:
             self.client_proc.terminate()
             self.client_proc.join()
 
-        # Stop all worker processes
+        # Give the workers a chance to deliver their pending posts
         for p in self.workers:
+            p.join(timeout=self.resolve_interval + 5)
             if p.is_alive():
                 p.terminate()
-            p.join()
-
+                p.join()
+
+        if isinstance(self.batch_callback, SinkProcess):
+            self.batch_callback.close()
+
+        if self.checkpoint and self._update_checkpoint():
+            self.checkpoint.save()
+
+        if self.prefilter:
+            print(f"Prefilter stats: {self.filter_stats()}")
+        if self.record_filter:
+            print(f"Record filter stats: {self.record_filter_stats()}")
+        if self.ring:
+            print(f"Frame ring stats: {self.ring.stats()}")
+            self.ring.close(unlink=True)
+            self.ring = None
         print("Firehose collection stopped.")
 
+    def transport_stats(self):
+        """Drop, occupancy and lag counters of the shared frame ring."""
+        return self.ring.stats() if self.ring else None
+
+    def filter_stats(self):
+        """Prefilter pass/reject counters summed over all workers."""
+        return prefilter_stats(list(self.filter_counts))
+
+    def record_filter_stats(self):
+        """Record filter pass count and per-rule rejections summed over all workers."""
+        return record_filter_stats(list(self.record_counts))
+
 # ==============================================================================
 # Optional: A Default CSV Callback
 # ==============================================================================
 
+CSV_HEADER = ["Post ID", "Author", "Text", "Created At", "URI", "URL", "Has Images", "Reply To"]
+
+def _csv_row(post_id, post_data):
+    """Build one CSV row from post_data."""
+    # Build a post URL from the URI
+    post_url = f"https://bsky.app/profile/{post_data['author']}/post/{post_data['uri'].split('/')[-1]}"
+    return [
+        post_id,
+        post_data['author'],
+        post_data['text'].replace("\n", " "),
+        post_data['created_at'],
+        post_data['uri'],
+        post_url,
+        post_data['has_images'],
+        post_data['reply_to'] or "N/A"
+    ]
+
 def csv_data_callback_factory(output_file="bluesky_posts.csv"):
     """
     Returns a callback function that saves incoming post_data to a CSV file.
     This is purely optional – you can define your own callback for any DB/storage.
+    It opens the file once per post, for anything beyond light use prefer
+    the buffered `csv_sink_factory`.
     """
     # Ensure the output directory exists
     os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
@@ -257,7 +789,7 @@ def csv_data_callback_factory(output_file="bluesky_posts.csv"):
     if not file_exists:
         with open(output_file, 'a', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            writer.writerow(["Post ID", "Author", "Text", "Created At", "URI", "URL", "Has Images", "Reply To"])
+            writer.writerow(CSV_HEADER)
 
     def _csv_data_callback(post_data):
         """
@@ -265,21 +797,141 @@ def csv_data_callback_factory(output_file="bluesky_posts.csv"):
         """
         post_id = next(post_id_generator)
 
-        # Build a post URL from the URI
-        post_url = f"https://bsky.app/profile/{post_data['author']}/post/{post_data['uri'].split('/')[-1]}"
-
         # Write the data
         with open(output_file, 'a', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            writer.writerow([
-                post_id,
-                post_data['author'],
-                post_data['text'].replace("\n", " "),
-                post_data['created_at'],
-                post_data['uri'],
-                post_url,
-                post_data['has_images'],
-                post_data['reply_to'] or "N/A"
-            ])
+            writer.writerow(_csv_row(post_id, post_data))
 
     return _csv_data_callback
+
+# ==============================================================================
+# Batched Sinks
+# ==============================================================================
+
+class CsvSink:
+    """
+    Batch callback that appends posts to a CSV file through one open handle.
+
+    Rows are buffered and written every `flush_rows` rows or every
+    `flush_interval` seconds. Each process that calls the sink opens its own
+    handle, so with several workers wrap it in a `SinkProcess`.
+    """
+    def __init__(self, output_file="bluesky_posts.csv", flush_rows=500, flush_interval=2.0):
+        self.output_file = output_file
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.next_id = 1
+        self.rows = []
+        self.file = None
+        self.writer = None
+        self.last_flush = time.time()
+
+    def __getstate__(self):
+        # Open file handles stay in the process that opened them
+        state = self.__dict__.copy()
+        state.update(rows=[], file=None, writer=None)
+        return state
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.output_file) or ".", exist_ok=True)
+        write_header = not os.path.exists(self.output_file) or os.path.getsize(self.output_file) == 0
+        self.file = open(self.output_file, 'a', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        if write_header:
+            self.writer.writerow(CSV_HEADER)
+
+    def __call__(self, posts):
+        for post_data in posts:
+            self.rows.append(_csv_row(self.next_id, post_data))
+            self.next_id += 1
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        if len(self.rows) >= self.flush_rows or \
+                (self.rows and time.time() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            if self.file is None:
+                self._open()
+            self.writer.writerows(self.rows)
+            self.file.flush()
+            self.rows.clear()
+        self.last_flush = time.time()
+
+    def close(self):
+        self.flush()
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def _sink_process(sink, queue, flush_interval):
+    """Single writer loop: apply every batch from the queue to `sink` until a None arrives."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    flush_if_due = getattr(sink, 'flush_if_due', None)
+    while True:
+        try:
+            batch = queue.get(timeout=flush_interval)
+        except Empty:
+            batch = []
+        if batch is None:
+            break
+        try:
+            if batch:
+                sink(batch)
+            elif flush_if_due:
+                flush_if_due()
+        except Exception as e:
+            print(f"Sink error: {e}")
+    if hasattr(sink, 'close'):
+        sink.close()
+
+class SinkProcess:
+    """
+    Batch callback that forwards batches to one dedicated process running
+    `sink`, so several workers never write to the same file at once.
+    Batches cross the process boundary as one pickle each, not one per post.
+    FirehoseScraper starts and closes it together with the collection.
+    """
+    def __init__(self, sink, flush_interval=1.0):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.queue = multiprocessing.Queue()
+        self.process = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['process'] = None
+        return state
+
+    def start(self):
+        if self.process is None:
+            self.process = multiprocessing.Process(
+                target=_sink_process,
+                args=(self.sink, self.queue, self.flush_interval)
+            )
+            self.process.start()
+
+    def __call__(self, posts):
+        if posts:
+            self.queue.put(posts)
+
+    def close(self, timeout=10):
+        """Flush everything that was queued and stop the writer process."""
+        if self.process is None:
+            return
+        self.queue.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.process = None
+
+def csv_sink_factory(output_file="bluesky_posts.csv", flush_rows=500, flush_interval=2.0, single_writer=True):
+    """
+    Returns a buffered CSV batch callback for `start_collection(batch_callback=...)`.
+    With single_writer=True (the default) all workers feed one writer process.
+    """
+    sink = CsvSink(output_file, flush_rows, flush_interval)
+    return SinkProcess(sink, flush_interval) if single_writer else sink
@@ -0,0 +1,159 @@
+"""
+Batch polarity scoring that gives the same numbers as spacytextblob's
+doc._.blob.polarity (TextBlob's PatternAnalyzer) for clean_text output.
+
+TextBlob rebuilds a blob, re-tokenizes and walks a dict-of-dicts lexicon
+for every document. Here the lexicon TextBlob loads is compiled once into
+NumPy arrays, every token of a batch is looked up once, and the per-text
+averages, including "very good"-style modifiers, are array reductions.
+Texts with a negation or an emoticon go through a port of pattern's
+sequential `assessments`, which is where those rules live.
+"""
+
+import threading
+
+import numpy as np
+from textblob.en import sentiment as textblob_sentiment
+# The tokenizer constants TextBlob's find_tokens uses, so both split texts the same way
+from textblob._text import EMOTICONS, PUNCTUATION, RE_EMOTICONS
+
+NEGATIONS = ("no", "not", "n't", "never")
+MODIFIER_POS = "RB"
+
+# find_tokens splits these off both ends of a token (periods are handled apart, and
+# clean_text removes them anyway)
+_EDGE_PUNCTUATION = tuple(PUNCTUATION.replace(".", ""))
+
+def tokenize(text):
+    """Lowercased tokens of `text`, split the way TextBlob's find_tokens splits clean_text output."""
+    tokens = []
+    for t in text.split():
+        tail = []
+        while t.startswith(_EDGE_PUNCTUATION):
+            tokens.append(t[0])
+            t = t[1:]
+        while t.endswith(_EDGE_PUNCTUATION):
+            tail.append(t[-1])
+            t = t[:-1]
+        if t:
+            tokens.append(t)
+        tokens.extend(reversed(tail))
+    joined = RE_EMOTICONS.sub(lambda m: m.group(1).replace(" ", "") + m.group(2), " ".join(tokens))
+    return joined.lower().split()
+
+class SentimentLexicon:
+    """TextBlob's English sentiment lexicon as arrays: polarity, intensity and modifier flag per word id."""
+    def __init__(self):
+        # len() makes the lazy lexicon load, including the "-ly" adverbs TextBlob derives
+        len(textblob_sentiment)
+        entries = dict.items(textblob_sentiment)
+        self.vocab = {word: i for i, (word, _) in enumerate(entries)}
+        self.polarity = np.array([pos[None][0] for _, pos in entries], dtype=np.float64)
+        self.intensity = np.array([pos[None][2] for _, pos in entries], dtype=np.float64)
+        self.modifier = np.array([MODIFIER_POS in pos for _, pos in entries], dtype=bool)
+
+        # First match wins, like the EMOTICONS scan in assessments
+        self.emoticons = {}
+        for (_, p), faces in EMOTICONS.items():
+            for face in faces:
+                self.emoticons.setdefault(face.lower(), p)
+        # Tokens that need the sequential rules: negations, and emoticons that aren't plain words
+        self.special = set(NEGATIONS) | {
+            face for face in self.emoticons
+            if face not in self.vocab and not face.isalpha() and len(face) <= 5 and face not in PUNCTUATION
+        }
+
+    def assess(self, tokens):
+        """pattern's Sentiment.assessments and average for one tokenized text, polarity only."""
+        a = []  # [polarity, intensity, negated] per assessment
+        m = n = None
+        for w in tokens:
+            wid = self.vocab.get(w)
+            if wid is not None:
+                p, i = self.polarity[wid], self.intensity[wid]
+                if m is None:
+                    a.append([p, i, False])
+                else:
+                    a[-1][0] = max(-1.0, min(p * a[-1][1], 1.0))
+                    a[-1][1] = i
+                if n is not None:
+                    a[-1][1] = 1.0 / a[-1][1]
+                    a[-1][2] = True
+                m = w if self.modifier[wid] else None
+                n = w if w in NEGATIONS else None
+            else:
+                if w in NEGATIONS:
+                    n = w
+                elif n and len(w.strip("'")) > 1:
+                    n = None
+                if n is not None and m is not None and m.endswith("ly"):
+                    a[-1][2] = True
+                    n = None
+                elif m and len(w) > 2:
+                    m = None
+                if not w.isalpha() and len(w) <= 5 and w not in PUNCTUATION and w in self.emoticons:
+                    a.append([self.emoticons[w], 1.0, False])
+        s = 0
+        for p, _, negated in a:
+            s += p * -0.5 if negated else p
+        return s / float(len(a) or 1)
+
+    def score(self, texts):
+        """Polarity of each text as a float64 array, in input order."""
+        tokenized = [tokenize(text) for text in texts]
+        lengths = np.fromiter(map(len, tokenized), dtype=np.int64, count=len(tokenized))
+        tokens = [t for toks in tokenized for t in toks]
+        scores = np.zeros(len(texts))
+        if not tokens:
+            return scores
+
+        text_idx = np.repeat(np.arange(len(texts)), lengths)
+        vocab_get = self.vocab.get
+        ids = np.fromiter((vocab_get(t, -1) for t in tokens), dtype=np.int64, count=len(tokens))
+        special = np.fromiter((t in self.special for t in tokens), dtype=bool, count=len(tokens))
+        sequential = np.zeros(len(texts), dtype=bool)
+        sequential[text_idx[special]] = True
+
+        # A known word joins the assessment of the known word before it when that one is a
+        # modifier in the same text and no unknown word longer than two characters sits between
+        long_unknown = (ids < 0) & (np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens)) > 2)
+        unknown_run = np.cumsum(long_unknown)
+        known = np.flatnonzero(ids >= 0)
+        if known.size:
+            kid, ktext = ids[known], text_idx[known]
+            modified = np.zeros(known.size, dtype=bool)
+            modified[1:] = (
+                (ktext[1:] == ktext[:-1])
+                & self.modifier[kid[:-1]]
+                & (unknown_run[known[1:]] == unknown_run[known[:-1]])
+            )
+            value = self.polarity[kid]
+            value[1:] = np.where(
+                modified[1:], np.clip(value[1:] * self.intensity[kid[:-1]], -1.0, 1.0), value[1:]
+            )
+            # Each assessment ends up with the value of the last word merged into it
+            last = np.ones(known.size, dtype=bool)
+            last[:-1] = ~modified[1:]
+            sums = np.bincount(ktext[last], weights=value[last], minlength=len(texts))
+            counts = np.bincount(ktext[last], minlength=len(texts))
+            np.divide(sums, counts, out=scores, where=counts > 0)
+
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        for i in np.flatnonzero(sequential):
+            scores[i] = self.assess(tokens[offsets[i]:offsets[i + 1]])
+        return scores
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+def get_lexicon():
+    """The compiled lexicon, built on first use."""
+    global _lexicon
+    with _lexicon_lock:
+        if _lexicon is None:
+            _lexicon = SentimentLexicon()
+    return _lexicon
+
+def batch_polarity(texts):
+    """TextBlob-compatible polarity of each cleaned text, as a list of floats."""
+    return get_lexicon().score(texts).tolist()
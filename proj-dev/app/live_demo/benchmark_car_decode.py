@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for per-commit CAR decoding on recorded firehose frames.
+
+Compares the old path (decode the whole CAR and scan every block, once per
+op) with the targeted one in firehose_utils.extract_post_records (decode
+once per commit, look each op's record up by its CID).
+
+Record some frames first (see firehose_replay.py), then benchmark them:
+    python benchmark_car_decode.py --record 5000 frames.bin.gz
+    python benchmark_car_decode.py frames.bin.gz
+"""
+
+import sys
+import time
+import argparse
+import statistics
+
+from atproto import parse_subscribe_repos_message, CAR
+try:
+    from atproto_subscription.frames import Frame
+except ImportError:
+    from atproto_firehose.models import Frame
+
+from firehose_utils import extract_post_records
+from firehose_replay import read_frames, record_firehose
+
+def load_commits(path):
+    """Parse the recorded frames and keep the commits that create posts."""
+    commits = []
+    for _, raw_frame in read_frames(path):
+        try:
+            commit = parse_subscribe_repos_message(Frame.from_bytes(raw_frame))
+        except Exception:
+            continue
+        post_ops = [
+            op for op in getattr(commit, 'ops', None) or []
+            if op.action == 'create' and op.path.startswith('app.bsky.feed.post/')
+        ]
+        if post_ops:
+            commits.append((commit, post_ops))
+    return commits
+
+def decode_full_scan(commit, post_ops):
+    """The old path: every op decodes the whole CAR and scans all of its blocks."""
+    records = []
+    for op in post_ops:
+        car = CAR.from_bytes(commit.blocks)
+        for record in car.blocks.values():
+            if isinstance(record, dict) and record.get('$type') == 'app.bsky.feed.post':
+                records.append(record)
+                break
+    return records
+
+def decode_targeted(commit, post_ops):
+    return [record for _, record in extract_post_records(commit.blocks, post_ops)]
+
+def time_per_commit(decode, commits, rounds):
+    """Return the per-commit decode times in microseconds, best of `rounds`."""
+    best = [float('inf')] * len(commits)
+    for _ in range(rounds):
+        for i, (commit, post_ops) in enumerate(commits):
+            start = time.perf_counter()
+            decode(commit, post_ops)
+            best[i] = min(best[i], (time.perf_counter() - start) * 1e6)
+    return best
+
+def summarize(name, timings):
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<12} mean {statistics.mean(timings):8.1f}us  "
+          f"median {statistics.median(timings):8.1f}us  p99 {p99:8.1f}us  "
+          f"total {sum(timings) / 1e3:8.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('frames', help="Firehose recording, see firehose_replay.py")
+    parser.add_argument('--record', type=int, metavar='N', help="Record N live frames into the file first")
+    parser.add_argument('--rounds', type=int, default=5, help="Timing rounds, the best round per commit is kept")
+    args = parser.parse_args()
+
+    if args.record:
+        record_firehose(args.frames, count=args.record)
+
+    commits = load_commits(args.frames)
+    if not commits:
+        print(f"No post-creating commits in {args.frames}")
+        return 1
+    ops = sum(len(post_ops) for _, post_ops in commits)
+    print(f"{len(commits)} commits with {ops} post ops, {args.rounds} rounds")
+
+    # Both paths must agree before their timings mean anything
+    mismatches = sum(
+        decode_full_scan(c, o) != decode_targeted(c, o) for c, o in commits
+        if len(o) == 1
+    )
+    if mismatches:
+        print(f"Warning: {mismatches} single-op commits decoded differently")
+
+    before = time_per_commit(decode_full_scan, commits, args.rounds)
+    after = time_per_commit(decode_targeted, commits, args.rounds)
+    summarize("full scan", before)
+    summarize("targeted", after)
+    print(f"Speedup: {sum(before) / sum(after):.2f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Latency and recall of the fuzzy toponym index (fuzzy_index.py) against the
+substring scan it replaces (LocalGazetteer.alternate_substring, the
+in-process equivalent of the ilike '%term%' query).
+
+Queries are indexed names and alternate names with 1 to --edits random
+edits; a query counts as recalled when the original term is among the
+returned candidates.
+
+    python benchmark_fuzzy_index.py --gazetteer ../../data/US.txt --queries 2000
+"""
+
+import os
+import sys
+import time
+import random
+import string
+import argparse
+import statistics
+
+from fuzzy_index import FuzzyToponymIndex
+from gazetteer_engine import LocalGazetteer
+
+LIVE_DEMO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GAZETTEER = os.path.join(LIVE_DEMO_DIR, "..", "..", "data", "US.txt")
+
+def misspell(term, edits, rng):
+    chars = list(term)
+    for _ in range(edits):
+        pos = rng.randrange(len(chars) + 1)
+        op = rng.choice(("substitute", "insert", "delete")) if pos < len(chars) else "insert"
+        if op == "substitute":
+            chars[pos] = rng.choice(string.ascii_lowercase)
+        elif op == "insert":
+            chars.insert(pos, rng.choice(string.ascii_lowercase))
+        elif len(chars) > 1:
+            del chars[pos]
+    return "".join(chars)
+
+def timed(fn, queries):
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return results, timings
+
+def summary(timings):
+    return f"{statistics.median(timings):>10.0f} {timings[int(len(timings) * 0.95) - 1]:>10.0f}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--gazetteer', default=DEFAULT_GAZETTEER, help="GeoNames file or .gaz artifact")
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--edits', type=int, default=2, help="Most random edits per query")
+    parser.add_argument('--max-distance', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = FuzzyToponymIndex.from_file(args.gazetteer, max_distance=args.max_distance)
+    print(f"Built fuzzy index in {time.perf_counter() - start:.1f}s: {index.stats()}")
+    local = LocalGazetteer.from_file(args.gazetteer)
+
+    rng = random.Random(args.seed)
+    originals = [term for term in rng.sample(index.terms, min(args.queries, len(index.terms))) if len(term) > 3]
+    queries = [misspell(term, rng.randint(1, args.edits), rng) for term in originals]
+
+    fuzzy_results, fuzzy_timings = timed(index.candidates, queries)
+    scan_results, scan_timings = timed(local.alternate_substring, queries)
+    recalled = sum(any(term == original for term, _, _ in found) for found, original in zip(fuzzy_results, originals))
+
+    print(f"{len(queries)} queries with 1-{args.edits} edits, max distance {args.max_distance}")
+    print(f"{'':<22} {'median us':>10} {'p95 us':>10} {'matched':>8}")
+    print(f"{'fuzzy index':<22} {summary(fuzzy_timings)} {sum(map(bool, fuzzy_results)):>8}")
+    print(f"{'substring scan':<22} {summary(scan_timings)} {sum(r is not None for r in scan_results):>8}")
+    print(f"Fuzzy recall (original term among candidates): {recalled / max(len(queries), 1):.1%}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
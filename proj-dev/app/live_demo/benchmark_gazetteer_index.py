@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Index build time and lookup throughput of gazetteer.build_location_index
+against build_location_dict + lookup_city_state_country.
+
+Lookups go through both implementations and their results are compared;
+the only expected differences are keys whose candidates tie on population,
+where the old sort_values pick is unspecified and the index takes the
+earlier row. --limit indexes only the first rows of the file (the iterrows
+build of the full US dump takes minutes).
+
+    python benchmark_gazetteer_index.py --gazetteer ../../data/US.txt --lookups 5000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+from gazetteer import (
+    US_STATE_NAMES, load_gazetteer, build_location_dict, lookup_city_state_country,
+    build_location_index, lookup_location,
+)
+
+LIVE_DEMO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GAZETTEER = os.path.join(LIVE_DEMO_DIR, "..", "..", "data", "US.txt")
+
+def sample_queries(location_index, n, seed):
+    """Indexed keys in a few casings, state names and codes, and some misses."""
+    rng = random.Random(seed)
+    keys = rng.sample(list(location_index), min(n, len(location_index)))
+    queries = [rng.choice((key, key.title(), key.upper(), f" {key} ")) for key in keys]
+    queries += list(US_STATE_NAMES) + list(US_STATE_NAMES.values())
+    queries += [f"{rng.choice(keys)} {rng.choice(keys)}" for _ in range(max(n // 10, 1))] if keys else []
+    return queries
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(query) for query in queries]
+    return results, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--gazetteer', default=DEFAULT_GAZETTEER, help="GeoNames file to index")
+    parser.add_argument('--limit', type=int, help="Only index the first LIMIT rows")
+    parser.add_argument('--lookups', type=int, default=2000, help="Indexed keys to look up")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--show', type=int, default=10, help="Print this many differences")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    gazetteer_df = load_gazetteer(args.gazetteer)
+    if args.limit:
+        gazetteer_df = gazetteer_df.head(args.limit)
+    print(f"Loaded {len(gazetteer_df)} rows in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    location_dict = build_location_dict(gazetteer_df)
+    dict_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    location_index = build_location_index(gazetteer_df)
+    index_seconds = time.perf_counter() - start
+
+    queries = sample_queries(location_index, args.lookups, args.seed)
+    old_results, old_seconds = timed(lambda q: lookup_city_state_country(q, gazetteer_df, location_dict), queries)
+    new_results, new_seconds = timed(lambda q: lookup_location(q, location_index), queries)
+
+    print(f"{len(location_dict)} keys (dict), {len(location_index)} keys (index), "
+          f"{len(set(map(id, location_index.values())))} distinct results")
+    print(f"{'':<28} {'build s':>9} {'lookups/s':>12}")
+    print(f"{'dict + lookup':<28} {dict_seconds:>9.2f} {len(queries) / old_seconds:>12.0f}")
+    print(f"{'precomputed index':<28} {index_seconds:>9.2f} {len(queries) / new_seconds:>12.0f}")
+    print(f"Build {dict_seconds / index_seconds:.1f}x faster, lookups {old_seconds / new_seconds:.0f}x faster")
+
+    differences = [(q, old, new) for q, old, new in zip(queries, old_results, new_results) if old != new]
+    print(f"{len(queries)} lookups, {len(differences)} differences")
+    for query, old, new in differences[:args.show]:
+        print(f"  {query!r}\n    dict:  {old}\n    index: {new}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
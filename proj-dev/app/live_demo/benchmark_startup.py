@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the live_demo services, each measured in a fresh interpreter.
+
+    import  seconds to import the module, its peak RSS and module count
+    ready   for the servers, seconds from launching the script until its
+            readiness endpoint answers, and the RSS of the process tree then
+
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 3 --targets entity_extraction model_server
+    python benchmark_startup.py --output startup_times.jsonl   # append, to track over time
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+import psutil
+import requests
+
+LIVE_DEMO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = {
+    "entity_extraction": {"module": "entity_extraction"},
+    "entry": {"module": "entry"},
+    "model_server": {"module": "model_server", "script": "model_server.py", "url": "http://localhost:5000/health"},
+    "firehose_scraper_server": {
+        "module": "firehose_scraper_server", "script": "firehose_scraper_server.py", "url": "http://localhost:5001/stats",
+    },
+}
+
+# Runs in the child interpreter, prints one JSON line last
+IMPORT_PROBE = """
+import sys, time, json, resource
+start = time.perf_counter()
+__import__(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({
+    'seconds': seconds,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'modules': len(sys.modules),
+}))
+"""
+
+def measure_import(module, timeout):
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE, module],
+        cwd=LIVE_DEMO_DIR, capture_output=True, text=True, timeout=timeout,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def tree_rss_mb(process):
+    """RSS of a process and its children (pre-fork workers), in MB."""
+    total = 0
+    for proc in [process] + process.children(recursive=True):
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / 1024 / 1024
+
+def measure_ready(script, url, timeout):
+    """Launch `script` and time how long until `url` answers 200."""
+    try:
+        requests.get(url, timeout=1)
+        raise RuntimeError(f"{url} already answers, stop the running service first")
+    except requests.RequestException:
+        pass
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, script], cwd=LIVE_DEMO_DIR,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{script} exited with code {proc.returncode} before it was ready")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"{script} not ready after {timeout}s")
+            try:
+                response = requests.get(url, timeout=1)
+                if response.status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.1)
+        seconds = time.perf_counter() - start
+        details = response.json()
+        return {
+            'seconds': seconds,
+            'rss_mb': tree_rss_mb(psutil.Process(proc.pid)),
+            'status': details.get('status') if isinstance(details, dict) else None,
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+def median_run(measure, runs):
+    results = [measure() for _ in range(runs)]
+    summary = {key: statistics.median(r[key] for r in results)
+               for key, value in results[0].items() if isinstance(value, (int, float))}
+    summary.update({key: value for key, value in results[-1].items() if key not in summary})
+    return summary
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=LIVE_DEMO_DIR, capture_output=True, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument('--runs', type=int, default=1, help="Runs per measurement, the median is reported")
+    parser.add_argument('--no-ready', action='store_true', help="Only measure imports, don't launch the servers")
+    parser.add_argument('--timeout', type=float, default=600, help="Seconds to wait for an import or a server")
+    parser.add_argument('--output', help="Append the results as one JSON line to this file")
+    args = parser.parse_args()
+
+    report = {}
+    for name in args.targets:
+        target = TARGETS[name]
+        entry = report[name] = {}
+        try:
+            entry['import'] = median_run(lambda: measure_import(target['module'], args.timeout), args.runs)
+        except Exception as e:
+            entry['import'] = {'error': str(e)}
+        if 'script' in target and not args.no_ready:
+            try:
+                entry['ready'] = median_run(lambda: measure_ready(target['script'], target['url'], args.timeout), args.runs)
+            except Exception as e:
+                entry['ready'] = {'error': str(e)}
+
+    print(f"{'target':<26} {'import s':>9} {'import MB':>10} {'modules':>8} {'ready s':>9} {'ready MB':>9}")
+    for name, entry in report.items():
+        imp, ready = entry['import'], entry.get('ready', {})
+        row = f"{name:<26} "
+        row += (f"{imp['seconds']:>9.2f} {imp['max_rss_mb']:>10.1f} {imp['modules']:>8}" if 'error' not in imp
+                else f"{'error':>9} {'':>10} {'':>8}")
+        if 'seconds' in ready:
+            row += f" {ready['seconds']:>9.2f} {ready['rss_mb']:>9.1f}"
+        elif 'error' in ready:
+            row += f" {'error':>9}"
+        print(row)
+        for kind, result in entry.items():
+            if 'error' in result:
+                print(f"  {kind}: {result['error']}")
+
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'time': time.time(), 'revision': git_revision(), 'results': report}) + "\n")
+        print(f"Appended to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
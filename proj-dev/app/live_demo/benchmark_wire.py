@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of the entry.py -> model_server calls at our batch sizes.
+
+Compares a fresh connection with a JSON body per request (the old
+requests.post), a pooled keep-alive session with JSON, and the pooled
+session with MessagePack (see wire.py). Without --url the requests go to a
+local server that decodes the request and answers canned results in the
+negotiated encoding, so only transport and encoding are measured; with
+--url they go to a running model_server and include the model.
+
+    python benchmark_wire.py --sizes 1 32 100 --requests 200
+    python benchmark_wire.py --url http://127.0.0.1:5000 --requests 20
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import threading
+import statistics
+
+import requests
+from flask import Flask
+from werkzeug.serving import make_server
+
+import wire
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+
+# What a standardized /extract_entities result looks like for a post that names a place
+CANNED_RESULT = {
+    "disasters": ["flood"],
+    "locations": ["Rock Island", "Illinois"],
+    "sentiment": "Negative",
+    "polarity": -0.35,
+    "city": "Rock Island",
+    "state": "Illinois",
+    "region": "Midwest",
+    "country": "United States",
+    "latitude": 41.50948,
+    "longitude": -90.57875,
+    "all_locations": [{"location": "Illinois", "state": "Illinois", "country": "United States"}],
+}
+
+def load_texts(limit):
+    texts = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.extend(row['tweet_text'] for row in json.load(f) if row.get('tweet_text'))
+        if len(texts) >= limit:
+            break
+    return texts[:limit] or ["Flooding on the Mississippi in #RockIsland this morning"] * limit
+
+def start_local_server():
+    """Serve canned results on a free port in a background thread, return its base URL."""
+    app = Flask(__name__)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    @app.route('/extract_entities', methods=['POST'])
+    def extract_entities():
+        wire.read_request()
+        return wire.respond(dict(CANNED_RESULT))
+
+    @app.route('/extract_entities_batch', methods=['POST'])
+    def extract_entities_batch():
+        data = wire.read_request()
+        return wire.respond({'results': [dict(CANNED_RESULT) for _ in data.get('texts', [])]})
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+def call(post, base_url, texts, mimetype):
+    if len(texts) == 1:
+        path, payload = '/extract_entities', {'text': texts[0]}
+    else:
+        path, payload = '/extract_entities_batch', {'texts': texts}
+    body = wire.dumps(payload, mimetype)
+    accept = wire.accept_header() if mimetype == wire.MSGPACK_MIMETYPE else wire.JSON_MIMETYPE
+    response = post(base_url + path, data=body, headers={'Content-Type': mimetype, 'Accept': accept}, timeout=60)
+    response.raise_for_status()
+    wire.loads(response.content, response.headers.get('Content-Type'))
+    return len(body), len(response.content)
+
+def run(mode, base_url, texts, n_requests):
+    """Time `n_requests` calls, return per-request milliseconds and the body sizes."""
+    mimetype = wire.MSGPACK_MIMETYPE if mode == 'session+msgpack' else wire.JSON_MIMETYPE
+    if mode == 'fresh+json':
+        post = requests.post
+    else:
+        session = requests.Session()
+        post = session.post
+    call(post, base_url, texts, mimetype)  # warm up (and open the pooled connection)
+    timings = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        sizes = call(post, base_url, texts, mimetype)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, sizes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="Base URL of a running model_server instead of the local canned server")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1, 32, 100], help="Texts per request")
+    parser.add_argument('--requests', type=int, default=200, help="Timed requests per size and mode")
+    args = parser.parse_args()
+
+    modes = ['fresh+json', 'session+json']
+    if wire.msgpack:
+        modes.append('session+msgpack')
+    else:
+        print("msgpack is not installed, skipping the MessagePack mode")
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        base_url, server = start_local_server()
+
+    texts = load_texts(max(args.sizes))
+    print(f"{'texts':>6} {'mode':<16} {'mean ms':>9} {'median ms':>10} {'p95 ms':>8} {'req bytes':>10} {'resp bytes':>11}")
+    for size in args.sizes:
+        for mode in modes:
+            timings, (request_bytes, response_bytes) = run(mode, base_url, texts[:size], args.requests)
+            timings.sort()
+            print(f"{size:>6} {mode:<16} {statistics.mean(timings):>9.2f} {statistics.median(timings):>10.2f} "
+                  f"{timings[int(len(timings) * 0.95) - 1]:>8.2f} {request_bytes:>10} {response_bytes:>11}")
+
+    if server:
+        server.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
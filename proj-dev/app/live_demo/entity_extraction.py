@@ -1,18 +1,9 @@
-import pandas as pd
-import spacy
-import glob
 import os
 import re
-from collections import Counter 
-from collections import defaultdict
-import numpy as np
-from spacy.lang.en import English
-from spacy.lookups import Lookups
-from spacy.pipeline import EntityRuler
-from spacytextblob.spacytextblob import SpacyTextBlob
 import json
-import sklearn
-import matplotlib.pyplot as plt
+import time
+import random
+import threading
 
 # data preprocessing
 
@@ -59,10 +50,22 @@ def clean_text(text: str) -> str:
     # Normalize spaces
     return ' '.join(cleaned.split())
 
-nlp = spacy.load("../disaster_ner")
+# The pipeline everything below runs on. model_server points it at the instance it
+# loaded, otherwise get_nlp() loads DEFAULT_VARIANT on first use, so importing
+# helpers like clean_text never loads spaCy or a model
+nlp = None
+DEFAULT_VARIANT = "trf"
+
+def get_nlp():
+    """The shared pipeline, loaded through the model_variants registry on first use."""
+    global nlp
+    if nlp is None:
+        from model_variants import get_model
+        nlp = get_model(DEFAULT_VARIANT)
+    return nlp
 
 def test_model(text):
-    doc = nlp(text)
+    doc = get_nlp()(text)
     for ent in doc.ents:
         print(f"Entity lemma: {ent.lemma_.lower()} | Ent text: {ent.text} | Label: {ent.label_} | Canonical label: {ent.ent_id_}")
     print(f"Polarity: {doc._.blob.polarity}, Subjectivity: {doc._.blob.subjectivity}")
@@ -71,13 +74,139 @@ def test_model(text):
 #extract entities and sentiment from tweet text
 
 headers = ["Negative", "Neutral", "Positive"]
+
+# Where polarity comes from: "textblob" reads doc._.blob (spacytextblob in the pipeline),
+# "batch" scores whole batches with batch_sentiment, so the pipeline can leave spacytextblob out
+sentiment_scorer = "textblob"
+
 def extract_ent_sent(text):
     #print("entity extraction text: ", text)
-    doc = nlp(clean_text(text))
+    cleaned = clean_text(text)
+    polarity = None
+    if sentiment_scorer == "batch":
+        from batch_sentiment import batch_polarity
+        polarity = batch_polarity([cleaned])[0]
+    return ent_sent_from_doc(get_nlp()(cleaned), polarity)
+
+# Per-component time spent in the pipeline, name -> [seconds, docs, batches],
+# collected for a `timing_sample_rate` share of batches (see timed_pipe)
+component_timings = {}
+timing_sample_rate = 0.0
+_timings_lock = threading.Lock()
+
+def timed_pipe(texts, batch_size=32):
+    """
+    Same result as list(nlp.pipe(texts)), but runs the components one after
+    another over the whole batch so each one's time can be measured and
+    added to component_timings. Meant for batches of at most batch_size.
+    """
+    nlp = get_nlp()
+    elapsed = {}
+    start = time.perf_counter()
+    docs = [nlp.make_doc(text) for text in texts]
+    elapsed['tokenizer'] = time.perf_counter() - start
+    for name, proc in nlp.pipeline:
+        start = time.perf_counter()
+        if hasattr(proc, 'pipe'):
+            docs = list(proc.pipe(docs, batch_size=batch_size))
+        else:
+            docs = [proc(doc) for doc in docs]
+        elapsed[name] = time.perf_counter() - start
+
+    for name, seconds in elapsed.items():
+        _record_timing(name, seconds, len(docs))
+    return docs
+
+def _record_timing(name, seconds, docs):
+    with _timings_lock:
+        timing = component_timings.setdefault(name, [0.0, 0, 0])
+        timing[0] += seconds
+        timing[1] += docs
+        timing[2] += 1
+
+def extract_ent_sent_batch(texts, batch_size=32):
+    """
+    Batched extract_ent_sent: runs all texts through nlp.pipe so the model
+    works on batch_size documents at a time. Results come back in input order.
+    If a batch fails, its texts are retried one by one, and a text that still
+    fails gets the exception in its place instead of a result.
+    """
+    results = []
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        try:
+            cleaned = [clean_text(text) for text in chunk]
+            timed = timing_sample_rate and random.random() < timing_sample_rate
+            if timed:
+                docs = timed_pipe(cleaned, batch_size)
+            else:
+                docs = get_nlp().pipe(cleaned, batch_size=batch_size)
+            polarities = [None] * len(cleaned)
+            if sentiment_scorer == "batch":
+                from batch_sentiment import batch_polarity
+                start_time = time.perf_counter()
+                polarities = batch_polarity(cleaned)
+                if timed:
+                    _record_timing("batch_sentiment", time.perf_counter() - start_time, len(cleaned))
+            results.extend([ent_sent_from_doc(doc, polarity) for doc, polarity in zip(docs, polarities)])
+        except Exception:
+            for text in chunk:
+                try:
+                    results.append(extract_ent_sent(text))
+                except Exception as e:
+                    results.append(e)
+    return results
+
+DISASTER_TYPES_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "disasters", "disaster_types.json"
+)
+_screen_pattern = None
+
+def _disaster_screen_pattern():
+    """Regex over the disaster_types.json synonyms, for models without an entity_ruler."""
+    global _screen_pattern
+    if _screen_pattern is None:
+        with open(DISASTER_TYPES_FILE, 'r', encoding='utf-8') as f:
+            synonyms = [syn for syns in json.load(f)["disasters"].values() for syn in syns]
+        alternatives = sorted((r'\s+'.join(map(re.escape, syn.split())) for syn in synonyms), key=len, reverse=True)
+        _screen_pattern = re.compile(r'\b(?:' + '|'.join(alternatives) + r')s?\b', re.IGNORECASE)
+    return _screen_pattern
+
+def screen_disasters(texts):
+    """
+    First stage of the cascade: True for each text that mentions a disaster.
+    DISASTER labels come from the pipeline's entity_ruler, so running just the
+    tokenizer and that ruler gives the same answer as the full pipeline
+    without the transformer or sentiment passes.
+    """
+    nlp = get_nlp()
+    cleaned = [clean_text(text) for text in texts]
+    if "entity_ruler" not in nlp.pipe_names:
+        pattern = _disaster_screen_pattern()
+        return [bool(pattern.search(text)) for text in cleaned]
+    ruler = nlp.get_pipe("entity_ruler")
+    return [
+        any(ent.label_ == "DISASTER" for ent in ruler(nlp.make_doc(text)).ents)
+        for text in cleaned
+    ]
+
+def sentiment_label(score):
+    """Negative / Neutral / Positive for a polarity score."""
+    if score >= 0.1:
+        return headers[2]
+    elif score < 0:
+        return headers[0]
+    return headers[1]
+
+def ent_sent_from_doc(doc, polarity=None):
+    """`polarity`, when given, comes from the batch scorer instead of doc._.blob."""
     disasters = set()  # Use set to deduplicate identical disasters
     locations = set()  # Use set to deduplicate identical locations
-    sentiment = headers[1]
-    score = doc._.blob.polarity
+    # Profiles without spacytextblob (e.g. "ner-only") report neutral sentiment
+    if polarity is not None:
+        score = polarity
+    else:
+        score = doc._.blob.polarity if "spacytextblob" in get_nlp().pipe_names else 0.0
     
     for ent in doc.ents:
         if ent.label_ == "DISASTER":
@@ -93,11 +222,6 @@ def extract_ent_sent(text):
     
     #print("locations in ent sent: ", locations)
 
-    if score >= 0.1:
-        sentiment = headers[2]
-    elif score < 0:
-        sentiment = headers[0]
-    else:
-        sentiment = headers[1]
+    sentiment = sentiment_label(score)
 
     return {"disasters": list(disasters), "locations": list(locations), "sentiment": sentiment, "polarity": score}
@@ -5,6 +5,45 @@ import os
 import json
 import numpy as np
 import time
+import sys
+import queue
+import threading
+from requests.adapters import HTTPAdapter
+
+import wire
+
+MODEL_SERVER_URL = 'http://127.0.0.1:5000'
+
+# Keep-alive connections to the local services, one pooled session per thread
+_sessions = threading.local()
+
+def http_session():
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(pool_connections=2, pool_maxsize=4))
+        _sessions.session = session
+    return session
+
+# Request body encoding for model_server, MessagePack until the server turns it down
+model_server_mimetype = wire.preferred_mimetype()
+
+def post_model_server(path, payload, timeout):
+    """POST `payload` to model_server and decode the answer, whichever encoding it came in."""
+    global model_server_mimetype
+    mimetype = model_server_mimetype
+    response = http_session().post(
+        MODEL_SERVER_URL + path,
+        data=wire.dumps(payload, mimetype),
+        headers={'Content-Type': mimetype, 'Accept': wire.accept_header()},
+        timeout=timeout
+    )
+    if response.status_code == 415 and mimetype != wire.JSON_MIMETYPE:
+        print("model_server can't read MessagePack, switching to JSON")
+        model_server_mimetype = wire.JSON_MIMETYPE
+        return post_model_server(path, payload, timeout)
+    response.raise_for_status()  # Will raise a requests.HTTPError if status not 200
+    return wire.loads(response.content, response.headers.get('Content-Type'))
 
 def extract_entities(text):
     """
@@ -12,13 +51,71 @@ def extract_entities(text):
     Raises an exception if there's any HTTP/network error or if
     the server responds with 4xx/5xx status.
     """
-    response = requests.post(
-        'http://127.0.0.1:5000/extract_entities',
-        json={'text': text},
-        timeout=10
+    return post_model_server('/extract_entities', {'text': text}, timeout=10)
+
+def extract_entities_batch(texts, batch_size=None):
+    """
+    One call to the model_server's /extract_entities_batch endpoint for all texts.
+    Returns one result per text, in order; failed items are {'error': ...}.
+    """
+    payload = {'texts': list(texts)}
+    if batch_size:
+        payload['batch_size'] = batch_size
+    return post_model_server(
+        '/extract_entities_batch', payload, timeout=10 + len(payload['texts'])
+    )['results']
+
+# Texts per request when a whole batch failed and is retried in pieces
+FALLBACK_CHUNK_SIZE = 10
+
+def _checked_batch(texts):
+    results = extract_entities_batch(texts)
+    if len(results) != len(texts):
+        raise ValueError(f"model_server returned {len(results)} results for {len(texts)} texts")
+    return results
+
+def extract_entities_resilient(texts):
+    """
+    extract_entities_batch for all texts, retried in chunks of
+    FALLBACK_CHUNK_SIZE and then text by text when a request fails, so a
+    timeout or 5xx only costs the texts it was about. Returns one result per
+    text, in order; texts that still fail are {'error': ...}.
+    """
+    try:
+        return _checked_batch(texts)
+    except Exception as e:
+        print(f"Batch extraction of {len(texts)} texts failed, retrying in smaller requests: {e}")
+
+    results = []
+    chunk_size = FALLBACK_CHUNK_SIZE if len(texts) > FALLBACK_CHUNK_SIZE else 1
+    for start in range(0, len(texts), chunk_size):
+        chunk = texts[start:start + chunk_size]
+        if len(chunk) > 1:
+            try:
+                results.extend(_checked_batch(chunk))
+                continue
+            except Exception as e:
+                print(f"Extraction of texts {start}-{start + len(chunk) - 1} failed, retrying one by one: {e}")
+        for text in chunk:
+            try:
+                results.append(extract_entities(text))
+            except Exception as e:
+                results.append({'error': str(e)})
+    return results
+
+def resolve_author_handles(dids):
+    """
+    Resolve author DIDs to handles in one request to the scraper service.
+    Only called for posts that survived filtering, so rejected posts never
+    cost a DID lookup.
+    """
+    response = http_session().post(
+        'http://127.0.0.1:5001/resolve_handles',
+        json={'dids': list(dids)},
+        timeout=30
     )
-    response.raise_for_status()  # Will raise a requests.HTTPError if status not 200
-    return response.json()
+    response.raise_for_status()
+    return response.json().get('handles', {})
 
 def default_entity_data():
     """Return default entity data when extraction fails"""
@@ -36,19 +133,61 @@ def default_entity_data():
         'all_locations': None
     }
 
+# Position in the scraper's post buffer, advanced after every drain
+scrape_cursor = None
+
 def get_scraped_posts(limit=50):
+    global scrape_cursor
     url = "http://127.0.0.1:5001/scrape"
     params = {"limit": limit}
+    if scrape_cursor is not None:
+        params["cursor"] = scrape_cursor
     try:
-        response = requests.get(url, params=params)
+        response = http_session().get(url, params=params)
         response.raise_for_status()
         data = response.json()
+        scrape_cursor = data.get("cursor", scrape_cursor)
+        if data.get("dropped"):
+            print(f"Scraper buffer dropped {data['dropped']} posts before they were drained")
         return data.get("posts", [])
     except requests.exceptions.RequestException as e:
         return {"Request Error": str(e)}
     except Exception as e:
         return {"Error": str(e)}
 
+def stream_scraped_posts(reconnect_delay=1):
+    """
+    Yield posts from the scraper's /stream endpoint as soon as they arrive.
+    Reconnects after errors and resumes from scrape_cursor, so posts are only
+    lost if the scraper's buffer evicted them in the meantime. A malformed
+    line is logged and skipped.
+    """
+    global scrape_cursor
+    url = "http://127.0.0.1:5001/stream"
+    while True:
+        params = {"cursor": scrape_cursor} if scrape_cursor is not None else {}
+        try:
+            # The server sends a keepalive every 15s, so a much longer read timeout means a dead connection
+            with http_session().get(url, params=params, stream=True, timeout=(5, 60)) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                        if event.get("dropped"):
+                            print(f"Scraper buffer dropped {event['dropped']} posts before they were streamed")
+                            continue
+                        seq, post = event["seq"], event["post"]
+                    except (ValueError, KeyError, TypeError, AttributeError) as e:
+                        print(f"Skipping malformed stream line {line[:200]!r}: {e}")
+                        continue
+                    scrape_cursor = seq
+                    yield post
+        except requests.exceptions.RequestException as e:
+            print(f"Stream error, reconnecting: {e}")
+        time.sleep(reconnect_delay)
+
 def filter_posts(df: pd.DataFrame):
     # Create a copy of the DataFrame to avoid SettingWithCopyWarning
     df = df.copy()
@@ -66,17 +205,20 @@ def filter_posts(df: pd.DataFrame):
         'city', 'state', 'region', 'country', 'latitude', 'longitude', 'location'
     ]
     
-    # Process each row individually to avoid entity_data errors
+    # All texts go to the model server in one request, results come back in order
     processed_rows = []
-    
-    for idx, row in df.iterrows():
-        try:
-            # Extract entities with error handling
-            entity_result = extract_entities(row['text'])
+    entity_results = extract_entities_resilient(df['text'].tolist()) if not df.empty else []
+    if len(entity_results) != len(df):
+        raise ValueError(f"Got {len(entity_results)} entity results for {len(df)} posts")
 
+    for (idx, row), entity_result in zip(df.iterrows(), entity_results):
+        try:
             if not entity_result or not isinstance(entity_result, dict):
                 # If there's no valid entity data, skip
                 continue
+            if 'error' in entity_result:
+                print(f"Entity extraction failed for row {idx}: {entity_result['error']}")
+                continue
 
             disasters = entity_result.get('disasters', [])
             locations = entity_result.get('locations', [])
@@ -152,19 +294,39 @@ def filter_posts(df: pd.DataFrame):
                 
     return result_df
 
-def calculate_crisis_counts(df, existing_counts_file=None):
+def read_crisis_counts(counts_file):
+    """Counts saved by an earlier run, cities as lists, or None."""
+    if not counts_file or not os.path.exists(counts_file) or os.path.getsize(counts_file) == 0:
+        return None
+    try:
+        existing_counts = pd.read_csv(counts_file)
+    except Exception as e:
+        print(f"Error processing existing counts: {e}")
+        return None
+    # Convert string representation of cities lists back to actual lists
+    try:
+        existing_counts['cities'] = existing_counts['cities'].apply(
+            lambda x: eval(x) if isinstance(x, str) else (x if isinstance(x, list) else [])
+        )
+    except:
+        # If there's an error with the cities column, just use an empty list
+        existing_counts['cities'] = [[]] * len(existing_counts)
+    return existing_counts
+
+def calculate_crisis_counts(df, existing_counts_file=None, existing_counts=None):
+    """
+    Counts of `df` merged into `existing_counts`, the running counts of
+    earlier batches; without them they are read from existing_counts_file.
+    """
+    if existing_counts is None:
+        existing_counts = read_crisis_counts(existing_counts_file)
+
     # Drop rows without state information
     df = df.dropna(subset=["state"])
     
     if df.empty:
         # If no new data, return existing counts or empty DataFrame
-        if existing_counts_file and os.path.exists(existing_counts_file):
-            try:
-                return pd.read_csv(existing_counts_file)
-            except:
-                return pd.DataFrame()
-        else:
-            return pd.DataFrame()
+        return existing_counts if existing_counts is not None else pd.DataFrame()
     
     # Make a copy to avoid modifying the original dataframe
     df_copy = df.copy()
@@ -192,35 +354,21 @@ def calculate_crisis_counts(df, existing_counts_file=None):
         .round({'avg_sentiment': 2})
     )
     
-    # Handle existing counts file if it exists
-    if existing_counts_file and os.path.exists(existing_counts_file) and os.path.getsize(existing_counts_file) > 0:
+    # Merge with the counts of earlier batches
+    if existing_counts is not None and not existing_counts.empty:
         try:
-            existing_counts = pd.read_csv(existing_counts_file)
+            # Combine with new counts
+            combined = pd.concat([existing_counts, new_counts])
             
-            if not existing_counts.empty:
-                # Convert string representation of cities lists back to actual lists
-                try:
-                    existing_counts['cities'] = existing_counts['cities'].apply(
-                        lambda x: eval(x) if isinstance(x, str) else (x if isinstance(x, list) else [])
-                    )
-                except:
-                    # If there's an error with the cities column, just use an empty list
-                    existing_counts['cities'] = [[]] * len(existing_counts)
-                
-                # Combine with new counts
-                combined = pd.concat([existing_counts, new_counts])
-                
-                # Re-aggregate by country, state, and disaster type
-                counts = combined.groupby(["country", "state", "disasters"]).agg({
-                    'count': 'sum',
-                    'avg_sentiment': 'mean',
-                    'cities': lambda x: list(set([item for sublist in x for item in sublist if item]))
-                }).reset_index()
-                
-                # Sort and round
-                counts = counts.sort_values("count", ascending=False).round({'avg_sentiment': 2})
-            else:
-                counts = new_counts
+            # Re-aggregate by country, state, and disaster type
+            counts = combined.groupby(["country", "state", "disasters"]).agg({
+                'count': 'sum',
+                'avg_sentiment': 'mean',
+                'cities': lambda x: list(set([item for sublist in x for item in sublist if item]))
+            }).reset_index()
+            
+            # Sort and round
+            counts = counts.sort_values("count", ascending=False).round({'avg_sentiment': 2})
         except Exception as e:
             print(f"Error processing existing counts: {e}")
             counts = new_counts
@@ -301,7 +449,86 @@ def main(post_limit=50):
     if not posts:
         print("No posts to process. Skipping this run.")
         return
-    
+
+    process_posts(posts)
+
+def main_stream(max_batch=100):
+    """
+    Process posts from /stream as they arrive instead of polling /scrape.
+    A post is processed as soon as it is received, posts that arrived while
+    the previous batch was being processed are handled together (up to max_batch).
+    """
+    reset_csv_files()
+    received = queue.Queue()
+
+    def reader():
+        # Restarted on any error, a dead reader would leave the loop below waiting forever
+        while True:
+            try:
+                for post in stream_scraped_posts():
+                    received.put(post)
+            except Exception as e:
+                print(f"Stream reader failed, restarting: {e}")
+                time.sleep(1)
+
+    threading.Thread(target=reader, daemon=True).start()
+    while True:
+        posts = [received.get()]
+        while len(posts) < max_batch:
+            try:
+                posts.append(received.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            process_posts(posts)
+        except Exception as e:
+            print(f"Error: {e}")
+
+def add_default_columns(df, columns):
+    """Add the `columns` missing from df, filled with each column's empty value."""
+    for col in columns:
+        if col not in df.columns:
+            if col in ['disasters', 'locations', 'cities']:
+                df[col] = [[]] * len(df)
+            elif col in ['polarity']:
+                df[col] = 0.0
+            elif col in ['sentiment']:
+                df[col] = 'Neutral'
+            else:
+                df[col] = ''
+
+def save_filtered_posts(filtered_df, path):
+    """
+    Append filtered_df to the posts CSV in the column order of its header,
+    so a batch costs the same however long the session has run. The file
+    is only rewritten when the batch brings columns the header lacks.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        filtered_df.to_csv(path, index=False)
+        print(f"Created new file {path} with {len(filtered_df)} records")
+        return
+
+    try:
+        columns = pd.read_csv(path, nrows=0).columns.tolist()
+    except Exception as e:
+        print(f"Error reading existing filtered posts, creating new file: {e}")
+        filtered_df.to_csv(path, index=False)
+        return
+
+    add_default_columns(filtered_df, columns)
+    if all(col in columns for col in filtered_df.columns):
+        filtered_df[columns].to_csv(path, mode='a', header=False, index=False)
+    else:
+        existing_df = pd.read_csv(path)
+        add_default_columns(existing_df, filtered_df.columns)
+        pd.concat([existing_df, filtered_df]).to_csv(path, index=False)
+    print(f"Successfully appended {len(filtered_df)} records to {path}")
+
+# Crisis counts so far, carried between batches so the counts file is only read once
+crisis_counts = None
+
+def process_posts(posts):
+    global crisis_counts
     # Load collected posts
     try:
         df = pd.DataFrame(posts)
@@ -321,62 +548,27 @@ def main(post_limit=50):
     if filtered_df.empty:
         print("No crisis posts found. Skipping this run.")
         return
+
+    try:
+        handles = resolve_author_handles(filtered_df['author'].unique())
+        filtered_df['author'] = filtered_df['author'].map(lambda a: handles.get(a, a))
+    except Exception as e:
+        print(f"Error resolving author handles, keeping DIDs: {e}")
     
     # Save filtered posts
     try:
-        filtered_posts_output_file = 'filtered_posts.csv'
-        
-        # For appending, handle existing file properly
-        if os.path.exists(filtered_posts_output_file) and os.path.getsize(filtered_posts_output_file) > 0:
-            try:
-                # Try to read existing file
-                existing_df = pd.read_csv(filtered_posts_output_file)
-                
-                # Ensure column consistency
-                for col in filtered_df.columns:
-                    if col not in existing_df.columns:
-                        if col in ['disasters', 'locations', 'cities']:
-                            existing_df[col] = [[]] * len(existing_df)
-                        elif col in ['polarity']:
-                            existing_df[col] = 0.0
-                        elif col in ['sentiment']:
-                            existing_df[col] = 'Neutral'
-                        else:
-                            existing_df[col] = ''
-                
-                for col in existing_df.columns:
-                    if col not in filtered_df.columns:
-                        if col in ['disasters', 'locations', 'cities']:
-                            filtered_df[col] = [[]] * len(filtered_df)
-                        elif col in ['polarity']:
-                            filtered_df[col] = 0.0
-                        elif col in ['sentiment']:
-                            filtered_df[col] = 'Neutral'
-                        else:
-                            filtered_df[col] = ''
-                
-                # Combine and save
-                combined_df = pd.concat([existing_df, filtered_df])
-                combined_df.to_csv(filtered_posts_output_file, index=False)
-                print(f"Successfully appended {len(filtered_df)} records to {filtered_posts_output_file}")
-                
-            except Exception as e:
-                print(f"Error reading existing filtered posts, creating new file: {e}")
-                filtered_df.to_csv(filtered_posts_output_file, index=False)
-        else:
-            # Create new file
-            filtered_df.to_csv(filtered_posts_output_file, index=False)
-            print(f"Created new file {filtered_posts_output_file} with {len(filtered_df)} records")
+        save_filtered_posts(filtered_df, 'filtered_posts.csv')
     except Exception as e:
         print(f"Error saving filtered posts: {e}")
     
     try:
         # Calculate crisis counts
         crisis_counts_output_file = 'crisis_counts.csv'
-        counts = calculate_crisis_counts(filtered_df, crisis_counts_output_file)
+        counts = calculate_crisis_counts(filtered_df, crisis_counts_output_file, crisis_counts)
         
         if counts is not None and not counts.empty:
             counts.to_csv(crisis_counts_output_file, index=False)
+            crisis_counts = counts
             print(f"Successfully updated crisis counts with {len(counts)} records")
         else:
             print("No crisis counts to save")
@@ -387,9 +579,18 @@ def main(post_limit=50):
 
 if __name__ == '__main__':
     post_limit = 100
+    # Streaming is the default, pass --poll to drain /scrape in batches instead
+    if '--poll' not in sys.argv:
+        try:
+            main_stream(post_limit)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    poll_interval = 1  # /scrape returns immediately, so don't spin on an empty buffer
     while True:
         try:
             main(post_limit)
+            time.sleep(poll_interval)
         except KeyboardInterrupt:
             break
         except Exception as e:
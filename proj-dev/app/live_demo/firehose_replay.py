@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Record raw firehose frames to a file and replay them later without network access.
+
+A recording is a short magic header followed by one record per frame:
+(receive time as a double, frame length as uint32, big-endian) and the raw
+frame bytes. Paths ending in .gz are gzip-compressed transparently.
+
+    python firehose_replay.py record frames.bin.gz --count 20000
+    python firehose_replay.py info frames.bin.gz
+
+`ReplayClient` and `AsyncReplayClient` stand in for the websocket clients,
+see FirehoseScraper(replay_file=...) and FIREHOSE_REPLAY_FILE in
+firehose_scraper_server.py.
+"""
+
+import sys
+import gzip
+import time
+import struct
+import asyncio
+import inspect
+import argparse
+
+from atproto import FirehoseSubscribeReposClient
+try:
+    from atproto_subscription.frames import Frame, MessageFrame
+except ImportError:
+    from atproto_firehose.models import Frame, MessageFrame
+
+MAGIC = b'FHREC1\n'
+FRAME_HEADER = struct.Struct('>dI')
+
+def _open(path, mode):
+    return gzip.open(path, mode) if path.endswith('.gz') else open(path, mode)
+
+# ==============================================================================
+# Recording
+# ==============================================================================
+
+class RawFrameClient(FirehoseSubscribeReposClient):
+    """Firehose client that hands raw frame bytes to `on_raw_frame` instead of decoding them."""
+    def __init__(self, on_raw_frame, params=None):
+        super().__init__(params)
+        self._on_raw_frame = on_raw_frame
+
+    def _decode_frame(self, raw_frame):
+        if isinstance(raw_frame, bytes):
+            self._on_raw_frame(raw_frame)
+        return None
+
+class FrameRecorder:
+    """Appends raw frames with their receive time to a recording file."""
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self.file = _open(path, 'wb')
+        self.file.write(MAGIC)
+
+    def write(self, raw_frame, received_at=None):
+        self.file.write(FRAME_HEADER.pack(received_at or time.time(), len(raw_frame)))
+        self.file.write(raw_frame)
+        self.frames += 1
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def record_firehose(path, count=None, duration=None, cursor=None):
+    """
+    Record live frames into `path` until `count` frames or `duration`
+    seconds are reached, or until interrupted with Ctrl+C.
+    """
+    params = {'cursor': cursor} if cursor is not None else None
+    started = time.time()
+    with FrameRecorder(path) as recorder:
+        def on_raw_frame(raw_frame):
+            recorder.write(raw_frame)
+            if (count and recorder.frames >= count) or \
+                    (duration and time.time() - started >= duration):
+                client.stop()
+
+        client = RawFrameClient(on_raw_frame, params)
+        try:
+            client.start(lambda message: None)
+        except KeyboardInterrupt:
+            pass
+        print(f"Recorded {recorder.frames} frames to {path} in {time.time() - started:.1f}s")
+        return recorder.frames
+
+def read_frames(path):
+    """Yield (received_at, raw_frame) for every frame in a recording."""
+    with _open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a firehose recording")
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            received_at, length = FRAME_HEADER.unpack(header)
+            raw_frame = f.read(length)
+            if len(raw_frame) < length:
+                print(f"Recording {path} ends with a truncated frame")
+                return
+            yield received_at, raw_frame
+
+# ==============================================================================
+# Replay
+# ==============================================================================
+
+class ReplayClient:
+    """
+    Drop-in replacement for the firehose websocket client that plays back a
+    recording instead.
+
+    `speed` scales the recorded inter-frame gaps: 1.0 is real time, 10 is
+    ten times faster and None (or 0) replays as fast as the consumer keeps up.
+    If `on_raw_frame` is given the raw bytes go there, like `RawFrameClient`,
+    otherwise the decoded frames go to the callback passed to `start()`.
+    Replay always starts at the beginning of the file, a cursor in
+    `params` is ignored.
+    """
+    def __init__(self, path, speed=1.0, on_raw_frame=None, params=None):
+        self.path = path
+        self.speed = speed
+        self.params = params
+        self._on_raw_frame = on_raw_frame
+        self._stopped = False
+        self.frames = 0
+
+    def update_params(self, params):
+        self.params = params
+
+    def _paced_frames(self):
+        """Yield (delay, raw_frame), the delay is how long to wait before delivering it."""
+        first_at = started = None
+        for received_at, raw_frame in read_frames(self.path):
+            if self._stopped:
+                return
+            delay = 0
+            if self.speed:
+                if first_at is None:
+                    first_at, started = received_at, time.monotonic()
+                due = started + (received_at - first_at) / self.speed
+                delay = max(0, due - time.monotonic())
+            yield delay, raw_frame
+
+    def _deliver(self, raw_frame, on_message_callback):
+        self.frames += 1
+        if self._on_raw_frame:
+            return self._on_raw_frame(raw_frame)
+        frame = Frame.from_bytes(raw_frame)
+        if isinstance(frame, MessageFrame):
+            return on_message_callback(frame)
+
+    def start(self, on_message_callback=None):
+        for delay, raw_frame in self._paced_frames():
+            if delay:
+                time.sleep(delay)
+            self._deliver(raw_frame, on_message_callback)
+
+    def stop(self):
+        self._stopped = True
+
+class AsyncReplayClient(ReplayClient):
+    """`ReplayClient` for code written against AsyncFirehoseSubscribeReposClient."""
+    async def start(self, on_message_callback=None):
+        for delay, raw_frame in self._paced_frames():
+            # Yield to the loop even at max speed so other tasks keep running
+            await asyncio.sleep(delay)
+            result = self._deliver(raw_frame, on_message_callback)
+            if inspect.isawaitable(result):
+                await result
+
+    async def stop(self):
+        self._stopped = True
+
+def recording_info(path):
+    """Frame count, byte size and time span of a recording."""
+    frames = size = 0
+    first_at = last_at = None
+    for received_at, raw_frame in read_frames(path):
+        frames += 1
+        size += len(raw_frame)
+        first_at = received_at if first_at is None else first_at
+        last_at = received_at
+    span = (last_at - first_at) if frames else 0
+    return {
+        'frames': frames,
+        'bytes': size,
+        'span_seconds': round(span, 3),
+        'frames_per_second': round(frames / span, 1) if span else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or inspect raw firehose frames.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record', help="Record live frames")
+    rec.add_argument('path', help="Output file, .gz to compress")
+    rec.add_argument('--count', type=int, help="Stop after this many frames")
+    rec.add_argument('--duration', type=float, help="Stop after this many seconds")
+    rec.add_argument('--cursor', type=int, help="Start from this sequence number")
+    info = sub.add_parser('info', help="Summarize a recording")
+    info.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record_firehose(args.path, args.count, args.duration, args.cursor)
+    else:
+        print(recording_info(args.path))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,26 +1,62 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import asyncio
-from atproto import AsyncFirehoseSubscribeReposClient, AsyncIdResolver, AsyncDidInMemoryCache, parse_subscribe_repos_message, CAR
+import os
+import json
+import threading
+from collections import deque
+from itertools import islice
+from atproto import AsyncFirehoseSubscribeReposClient, AsyncIdResolver, parse_subscribe_repos_message
 import time
+from firehose_utils import (
+    CursorCheckpoint, LexiconPrefilter, DEFAULT_EXTRA_TERMS, DidHandleCache, resolve_handles_async,
+    extract_post_records, RecordFilter
+)
+from firehose_replay import AsyncReplayClient
 
 app = Flask(__name__)
 
-async def process_post(commit, op, resolver):
-    """Process a single post from the Firehose."""
-    try:
-        car = CAR.from_bytes(commit.blocks)
-        for record in car.blocks.values():
-            if isinstance(record, dict) and record.get('$type') == 'app.bsky.feed.post':
-                post_data = {
-                    'text': record.get('text', ''),
-                    'created_at': record.get('createdAt', ''),
-                    'author': await resolve_author_handle(commit.repo, resolver),
-                    'uri': f'at://{commit.repo}/{op.path}',
-                }
-                return post_data
-    except Exception as e:
-        print(f"Error processing post: {e}")
+# Number of posts kept in memory between /scrape calls
+BUFFER_SIZE = int(os.environ.get("FIREHOSE_BUFFER_SIZE", 10000))
+RECONNECT_DELAY = 5
+# Where the last processed sequence number is kept across restarts
+CURSOR_FILE = os.environ.get("FIREHOSE_CURSOR_FILE", "firehose_cursor.json")
+MAX_CATCHUP_SECONDS = int(os.environ.get("FIREHOSE_MAX_CATCHUP_SECONDS", 3600))
+# Filters are off by default, as in blueskyapi.FirehoseScraper, so every post reaches the buffer.
+# DISASTER_PREFILTER=1 drops posts without any disaster vocabulary before they are decoded and resolved
+DISASTER_PREFILTER = os.environ.get("DISASTER_PREFILTER", "0") == "1"
+EXTRA_TERMS = [t for t in os.environ.get("DISASTER_EXTRA_TERMS", ",".join(DEFAULT_EXTRA_TERMS)).split(",") if t]
+# Record-level filter ahead of everything else, e.g. FIREHOSE_LANGS=en (the NER model downstream
+# is English only) and FIREHOSE_MIN_TEXT_LENGTH=10; empty and 0 keep every post
+LANGS = [l for l in os.environ.get("FIREHOSE_LANGS", "").split(",") if l]
+MIN_TEXT_LENGTH = int(os.environ.get("FIREHOSE_MIN_TEXT_LENGTH", 0))
+DROP_REPLIES = os.environ.get("FIREHOSE_DROP_REPLIES", "0") == "1"
+DROP_QUOTES = os.environ.get("FIREHOSE_DROP_QUOTES", "0") == "1"
+# DID -> handle cache shared with any other scraper process on this box
+DID_CACHE_FILE = os.environ.get("DID_CACHE_FILE", "did_handles.sqlite")
+DID_CACHE_TTL = int(os.environ.get("DID_CACHE_TTL", 86400))
+# Play a firehose_replay.py recording instead of the live stream, speed "max" for no pacing
+REPLAY_FILE = os.environ.get("FIREHOSE_REPLAY_FILE")
+REPLAY_SPEED = os.environ.get("FIREHOSE_REPLAY_SPEED", "1")
+REPLAY_SPEED = None if REPLAY_SPEED == "max" else float(REPLAY_SPEED)
+# /stream sends a keepalive after this many idle seconds so dead clients are noticed
+STREAM_HEARTBEAT = float(os.environ.get("STREAM_HEARTBEAT", 15))
+
+def process_post(commit, op, record, prefilter: LexiconPrefilter = None, record_filter: RecordFilter = None):
+    """
+    Process a single post record from the Firehose.
+    The author is left as the DID, handles are resolved later through
+    /resolve_handles for the posts that survive filtering.
+    """
+    if record_filter and not record_filter.check(record):
         return
+    if prefilter and not prefilter.match(record.get('text', '')):
+        return
+    return {
+        'text': record.get('text', ''),
+        'created_at': record.get('createdAt', ''),
+        'author': commit.repo,
+        'uri': f'at://{commit.repo}/{op.path}',
+    }
 
 async def resolve_author_handle(repo, resolver):
     """Resolve the author handle from the DID."""
@@ -32,59 +68,283 @@ async def resolve_author_handle(repo, resolver):
         return repo  # Fallback to DID
 
 async def listen_firehose(client: AsyncFirehoseSubscribeReposClient, 
-                          resolver: AsyncIdResolver, 
-                          post_limit=50,
-                          post_list:list=[]):
-    """Listen to the Firehose and process each received post."""
+                          on_post,
+                          checkpoint: CursorCheckpoint = None,
+                          prefilter: LexiconPrefilter = None,
+                          record_filter: RecordFilter = None):
+    """Listen to the Firehose and hand each received post to `on_post`."""
 
     async def message_handler(message):
-        nonlocal post_list
-
         commit = parse_subscribe_repos_message(message)
-        if not hasattr(commit, 'ops'):
-            return
-
-        for op in commit.ops:
-            if op.action == 'create' and op.path.startswith('app.bsky.feed.post/'):
-                post = await process_post(commit, op, resolver)
+        post_ops = [
+            op for op in getattr(commit, 'ops', None) or []
+            if op.action == 'create' and op.path.startswith('app.bsky.feed.post/')
+        ]
+        # Skip the CAR decode entirely if the raw blocks contain no disaster term
+        if post_ops and (prefilter is None or prefilter.match_bytes(commit.blocks)):
+            try:
+                # The CAR is decoded once per commit and shared by all of its ops
+                records = extract_post_records(commit.blocks, post_ops)
+            except Exception as e:
+                print(f"Error processing post: {e}")
+                records = []
+            for op, record in records:
+                post = process_post(commit, op, record, prefilter, record_filter)
                 if post:
-                    post_list.append(post)
-                if len(post_list) >= post_limit:
-                    await client.stop()
-                    return
+                    on_post(post)
 
-    try:
-        await client.start(message_handler)
-    except Exception as e:
-        print(f"Error listening to Firehose: {e}")
+        # Keep the reconnect cursor in step with the saved one, otherwise the
+        # client rolls back to the cursor it was started with
+        if checkpoint and checkpoint.update(getattr(commit, 'seq', None)):
+            client.update_params({'cursor': checkpoint.seq})
+
+    await client.start(message_handler)
+
+class PostBuffer:
+    """
+    Bounded ring buffer of scraped posts.
+
+    Every post gets a monotonically increasing sequence number so clients can
+    drain from a cursor, or block in `wait` until newer posts arrive.
+    When the buffer is full the oldest posts are evicted.
+    """
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.posts = deque(maxlen=capacity)  # (seq, received_at, post)
+        self.next_seq = 1
+        self.evicted = 0
+        self.lock = threading.Condition()
+
+    def append(self, post):
+        with self.lock:
+            if len(self.posts) == self.capacity:
+                self.evicted += 1
+            self.posts.append((self.next_seq, time.time(), post))
+            self.next_seq += 1
+            self.lock.notify_all()
+
+    def _read(self, cursor, limit):
+        """Return (batch, cursor, dropped) for the posts after `cursor`, the lock must be held."""
+        oldest_seq = self.posts[0][0] if self.posts else self.next_seq
+        # A cursor from before a server restart is ahead of the stream
+        if cursor is None or cursor > self.next_seq - 1:
+            cursor = oldest_seq - 1
+        dropped = max(0, oldest_seq - cursor - 1)
+
+        start = max(cursor + 1, oldest_seq) - oldest_seq
+        batch = list(islice(self.posts, start, start + limit))
+        cursor = batch[-1][0] if batch else max(cursor, oldest_seq - 1)
+        return batch, cursor, dropped
+
+    def drain(self, cursor=None, limit=50):
+        """
+        Return up to `limit` posts newer than `cursor` without waiting.
+
+        A missing cursor starts from the oldest buffered post. `dropped` counts
+        posts after the cursor that were evicted before this call, and `behind`
+        counts posts still buffered after the returned cursor.
+        """
+        with self.lock:
+            batch, cursor, dropped = self._read(cursor, limit)
+            behind = self.next_seq - 1 - cursor
+
+        lag_seconds = time.time() - batch[-1][1] if batch else 0.0
+        return {
+            "posts": [post for _, _, post in batch],
+            "cursor": cursor,
+            "dropped": dropped,
+            "behind": behind,
+            "lag_seconds": round(lag_seconds, 3),
+        }
+
+    def wait(self, cursor=None, limit=50, timeout=None):
+        """
+        Like `drain`, but block up to `timeout` seconds until there is a post
+        newer than `cursor`. Returns (batch, cursor, dropped) where batch
+        holds (seq, received_at, post) tuples and is empty on timeout.
+        """
+        with self.lock:
+            self.lock.wait_for(
+                lambda: self.posts and (cursor is None or cursor != self.next_seq - 1),
+                timeout
+            )
+            return self._read(cursor, limit)
 
 class FirehoseAPI:
-    def __init__(self):
-        self.client = AsyncFirehoseSubscribeReposClient()
-        self.resolver = AsyncIdResolver(cache=AsyncDidInMemoryCache())
-    
-    async def fetch_posts(self, post_limit):
-        self.client = AsyncFirehoseSubscribeReposClient()
-        post_list = []
-        await listen_firehose(self.client, self.resolver, post_limit, post_list)
-        return post_list
-        
-scraper = FirehoseAPI()
-loop = asyncio.new_event_loop()
-asyncio.set_event_loop(loop)
+    """
+    Keeps one long-lived Firehose subscription running on a background
+    thread and collects posts into a `PostBuffer` for `/scrape` to drain.
+    With `replay_file` set the posts come from a recording instead, played
+    once at `replay_speed` (see firehose_replay.py).
+    """
+    def __init__(self, buffer_size=10000, cursor_file=None, max_catchup_seconds=3600, prefilter=None,
+                 replay_file=None, replay_speed=1.0, record_filter=None):
+        self.buffer = PostBuffer(buffer_size)
+        self.prefilter = prefilter
+        self.record_filter = record_filter
+        self.replay_file = replay_file
+        self.replay_speed = replay_speed
+        # A replay must not overwrite the live stream's checkpoint
+        self.checkpoint = CursorCheckpoint(cursor_file, max_catchup_seconds=max_catchup_seconds) \
+            if cursor_file and not replay_file else None
+        self.resolver = AsyncIdResolver()
+        self.handle_cache = DidHandleCache(DID_CACHE_FILE, DID_CACHE_TTL)
+        self.client = None
+        self.loop = None
+        self.thread = None
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        """Start the background subscription if it isn't running yet."""
+        with self.start_lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._subscribe())
+
+    async def _subscribe(self):
+        if self.replay_file:
+            self.client = AsyncReplayClient(self.replay_file, self.replay_speed)
+            started = time.time()
+            try:
+                await listen_firehose(self.client, self.buffer.append, None, self.prefilter, self.record_filter)
+                print(f"Replay finished: {self.client.frames} frames in {time.time() - started:.1f}s")
+            except Exception as e:
+                print(f"Error replaying {self.replay_file}: {e}")
+            # Keep the loop alive for /resolve_handles
+            await asyncio.Event().wait()
+
+        # The client reconnects on network errors by itself, this only
+        # restarts it if start() gives up altogether.
+        while True:
+            cursor = self.checkpoint.load() if self.checkpoint else None
+            params = {'cursor': cursor} if cursor is not None else None
+            self.client = AsyncFirehoseSubscribeReposClient(params)
+            try:
+                await listen_firehose(self.client, self.buffer.append, self.checkpoint, self.prefilter,
+                                     self.record_filter)
+            except Exception as e:
+                print(f"Error listening to Firehose: {e}")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def drain(self, cursor=None, limit=50):
+        return self.buffer.drain(cursor, limit)
+
+    def resolve_handles(self, dids, timeout=30):
+        """Resolve a batch of DIDs concurrently on the subscription's event loop."""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(
+            resolve_handles_async(
+                dids,
+                lambda did: resolve_author_handle(did, self.resolver),
+                self.handle_cache
+            ),
+            self.loop
+        )
+        return future.result(timeout)
+
+    def stats(self):
+        return {
+            "buffered": len(self.buffer.posts),
+            "evicted": self.buffer.evicted,
+            "last_seq": self.buffer.next_seq - 1,
+            "prefilter": self.prefilter.stats() if self.prefilter else None,
+            "record_filter": self.record_filter.stats() if self.record_filter else None,
+            "replay": {"file": self.replay_file, "frames": self.client.frames} if self.replay_file and self.client else None,
+        }
+
+scraper = FirehoseAPI(
+    BUFFER_SIZE,
+    CURSOR_FILE,
+    MAX_CATCHUP_SECONDS,
+    LexiconPrefilter(EXTRA_TERMS) if DISASTER_PREFILTER else None,
+    REPLAY_FILE,
+    REPLAY_SPEED,
+    RecordFilter(LANGS, MIN_TEXT_LENGTH, DROP_REPLIES, DROP_QUOTES)
+    if LANGS or MIN_TEXT_LENGTH or DROP_REPLIES or DROP_QUOTES else None
+)
 
 @app.route("/scrape", methods=["GET"])
 def scrape():
     try:
+        scraper.start()
         post_limit = int(request.args.get("limit", 50))  # Default to 50 posts
+        cursor = request.args.get("cursor")
+        cursor = int(cursor) if cursor not in (None, "") else None
+        result = scraper.drain(cursor, post_limit)
+        print(f"Drained {len(result['posts'])} posts (cursor={result['cursor']}, "
+              f"dropped={result['dropped']}, behind={result['behind']})")
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _ndjson_event(seq=None, post=None, dropped=None):
+    if dropped:
+        return json.dumps({"dropped": dropped}) + "\n"
+    if post is None:
+        return "\n"  # keepalive, readers skip blank lines
+    return json.dumps({"seq": seq, "post": post}) + "\n"
+
+def _sse_event(seq=None, post=None, dropped=None):
+    if dropped:
+        return f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+    if post is None:
+        return ": keepalive\n\n"
+    return f"id: {seq}\ndata: {json.dumps(post)}\n\n"
+
+@app.route("/stream", methods=["GET"])
+def stream():
+    """
+    Push posts to the client as soon as they are buffered, as NDJSON lines
+    {"seq": n, "post": {...}} or, with format=sse or Accept: text/event-stream,
+    as Server-Sent Events with the seq as the event id. Resume with
+    ?cursor=<last seq> (or the Last-Event-ID header for SSE); posts evicted
+    in between are reported as {"dropped": n}.
+    """
+    scraper.start()
+    sse = request.args.get("format") == "sse" or "text/event-stream" in request.headers.get("Accept", "")
+    cursor = request.args.get("cursor") or request.headers.get("Last-Event-ID")
+    cursor = int(cursor) if cursor not in (None, "") else None
+    encode = _sse_event if sse else _ndjson_event
+
+    def generate(cursor):
+        while True:
+            batch, cursor, dropped = scraper.buffer.wait(cursor, 500, STREAM_HEARTBEAT)
+            if dropped:
+                yield encode(dropped=dropped)
+            if not batch:
+                yield encode()
+                continue
+            yield "".join(encode(seq, post) for seq, _, post in batch)
+
+    return Response(
+        generate(cursor),
+        mimetype="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/resolve_handles", methods=["POST"])
+def resolve_handles():
+    """Resolve a batch of author DIDs to handles: {"dids": [...]} -> {"handles": {did: handle}}"""
+    try:
+        dids = (request.json or {}).get("dids", [])
         startTime = time.time()
-        posts = loop.run_until_complete(scraper.fetch_posts(post_limit))
+        handles = scraper.resolve_handles(dids)
         elapsedTime = time.time() - startTime
-        print(f'Scraped {post_limit} posts in {elapsedTime:.2f}s')
-        return jsonify({"posts": posts})
+        print(f"Resolved {len(handles)} handles in {elapsedTime:.2f}s")
+        return jsonify({"handles": handles})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(scraper.stats())
+
 @app.route('/test_tweet', methods=['POST'])
 def test_tweet():
     data = request.json
@@ -101,4 +361,5 @@ def test_tweet():
     return jsonify({'posts': [test_post]})
 
 if __name__ == "__main__":
+    scraper.start()
     app.run(port=5001)
@@ -0,0 +1,391 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from atproto import CAR
+
+DISASTER_TYPES_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "disasters", "disaster_types.json"
+)
+
+# Common crisis vocabulary the disaster_types.json synonyms don't cover
+DEFAULT_EXTRA_TERMS = ["fire", "storm", "quake", "evacuat", "drought", "blizzard", "outbreak", "eruption"]
+
+# ==============================================================================
+# Cursor Checkpointing
+# ==============================================================================
+
+class CursorCheckpoint:
+    """
+    Remembers the last firehose sequence number in a small JSON state file
+    so a restarted client can resume where it stopped instead of at the
+    live head of the stream.
+
+    The cursor is written every `every_n` sequence numbers or every
+    `every_seconds` seconds, whichever comes first. A checkpoint older than
+    `max_catchup_seconds` is ignored so a long outage doesn't turn into an
+    unbounded replay.
+    """
+    def __init__(
+        self,
+        path="firehose_cursor.json",
+        every_n=1000,
+        every_seconds=5.0,
+        max_catchup_seconds=3600
+    ):
+        self.path = path
+        self.every_n = every_n
+        self.every_seconds = every_seconds
+        self.max_catchup_seconds = max_catchup_seconds
+        self.seq = None
+        self.saved_seq = None
+        self.saved_at = time.time()
+
+    def load(self):
+        """Return the cursor to resume from, or None to start at the live head."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            seq = int(state['seq'])
+            age = time.time() - float(state['saved_at'])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable cursor checkpoint {self.path}: {e}")
+            return None
+
+        if self.max_catchup_seconds is not None and age > self.max_catchup_seconds:
+            print(f"Cursor checkpoint is {age:.0f}s old (max {self.max_catchup_seconds}s), starting at live head")
+            return None
+
+        print(f"Resuming firehose from cursor {seq} ({age:.0f}s behind)")
+        self.seq = self.saved_seq = seq
+        return seq
+
+    def update(self, seq):
+        """Record a processed sequence number. Returns True if it was saved."""
+        if seq is None:
+            return False
+        if self.seq is None or seq > self.seq:
+            self.seq = seq
+
+        if self.saved_seq is None or self.seq - self.saved_seq >= self.every_n \
+                or time.time() - self.saved_at >= self.every_seconds:
+            return self.save()
+        return False
+
+    def save(self):
+        """Write the current cursor atomically."""
+        if self.seq is None or self.seq == self.saved_seq:
+            return False
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'seq': self.seq, 'saved_at': time.time()}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Could not save cursor checkpoint {self.path}: {e}")
+            return False
+        self.saved_seq = self.seq
+        self.saved_at = time.time()
+        return True
+
+# ==============================================================================
+# CAR Record Extraction
+# ==============================================================================
+
+POST_TYPE = 'app.bsky.feed.post'
+
+def extract_post_records(blocks, ops):
+    """
+    Decode a commit's CAR blocks once and pull out the post record of each op.
+
+    Each op carries the CID of the block it wrote, so the record is looked up
+    directly instead of scanning every block in the CAR. Returns a list of
+    (op, record) pairs, ops whose block is missing or isn't a post are skipped.
+    """
+    car = CAR.from_bytes(blocks)
+    pairs = []
+    for op in ops:
+        record = car.blocks.get(op.cid) if op.cid is not None else None
+        if isinstance(record, dict) and record.get('$type') == POST_TYPE:
+            pairs.append((op, record))
+    return pairs
+
+# ==============================================================================
+# Record-Level Filter
+# ==============================================================================
+
+RECORD_FILTER_RULES = ('lang', 'min_length', 'reply', 'quote')
+QUOTE_EMBED_TYPES = ('app.bsky.embed.record', 'app.bsky.embed.recordWithMedia')
+
+class RecordFilter:
+    """
+    Cheap checks on a decoded post record that decide whether it is worth
+    any further work, before the lexicon match, handle resolution or NER.
+
+    `langs` are the allowed language codes, matched on the primary subtag so
+    'en' also allows 'en-US'. Posts without a `langs` field pass unless
+    `allow_missing_lang` is False. `min_text_length` rejects empty and near
+    empty posts (e.g. image-only posts), `drop_replies`/`drop_quotes` reject
+    replies and quote posts. The first failing rule is counted in `counts`,
+    see `stats()`.
+    """
+    def __init__(self, langs=('en',), min_text_length=1, drop_replies=False, drop_quotes=False,
+                 allow_missing_lang=True):
+        self.langs = {lang.lower().split('-')[0] for lang in langs} if langs else None
+        self.min_text_length = min_text_length
+        self.drop_replies = drop_replies
+        self.drop_quotes = drop_quotes
+        self.allow_missing_lang = allow_missing_lang
+        # passed, then one rejection counter per rule in RECORD_FILTER_RULES
+        self.counts = [0] * (len(RECORD_FILTER_RULES) + 1)
+
+    def rejecting_rule(self, record):
+        """Return the name of the first rule `record` fails, or None if it passes."""
+        if self.langs is not None:
+            langs = record.get('langs')
+            if langs:
+                if not any(lang.lower().split('-')[0] in self.langs for lang in langs if isinstance(lang, str)):
+                    return 'lang'
+            elif not self.allow_missing_lang:
+                return 'lang'
+        if len((record.get('text') or '').strip()) < self.min_text_length:
+            return 'min_length'
+        if self.drop_replies and record.get('reply'):
+            return 'reply'
+        if self.drop_quotes and (record.get('embed') or {}).get('$type') in QUOTE_EMBED_TYPES:
+            return 'quote'
+        return None
+
+    def check(self, record):
+        rule = self.rejecting_rule(record)
+        if rule is None:
+            self.counts[0] += 1
+            return True
+        self.counts[1 + RECORD_FILTER_RULES.index(rule)] += 1
+        return False
+
+    def stats(self):
+        return record_filter_stats(self.counts)
+
+def record_filter_stats(counts):
+    """Turn raw record filter counters into a dict with per-rule rejections."""
+    return {
+        'passed': counts[0],
+        'rejected': dict(zip(RECORD_FILTER_RULES, counts[1:])),
+    }
+
+# ==============================================================================
+# Disaster Lexicon Prefilter
+# ==============================================================================
+
+def load_disaster_terms(path=DISASTER_TYPES_FILE, extra_terms=None):
+    """Return the lowercased disaster names and synonyms plus any extra terms."""
+    terms = set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            disasters = json.load(f)["disasters"]
+        for name, synonyms in disasters.items():
+            terms.add(name.lower())
+            terms.update(s.lower() for s in synonyms)
+    except Exception as e:
+        print(f"Could not load disaster lexicon from {path}: {e}")
+    terms.update(t.strip().lower() for t in (extra_terms or []) if t.strip())
+    return sorted(terms)
+
+def _trie_pattern(terms):
+    """
+    Compile the terms into one regex shaped like a prefix trie, so the regex
+    engine walks every term in a single pass instead of trying them one by one.
+    Matching is by prefix ('flood' also hits 'flooding'), so a term that ends
+    on a node makes the longer terms below it redundant. Spaces inside a term
+    match any run of separators, which also catches hashtags like #ForestFire.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        if '' in node:
+            return ''
+        alts = [(r'[\W_]*' if ch == ' ' else re.escape(ch)) + build(child)
+                for ch, child in sorted(node.items())]
+        return alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+
+    return build(trie)
+
+class LexiconPrefilter:
+    """
+    Cheap disaster-vocabulary check that runs before any expensive work.
+
+    `match_bytes` scans a commit's raw CAR bytes (post text is stored as
+    plain UTF-8 in there), so commits without any disaster term are
+    rejected before CAR decoding. `match` checks a single decoded post text.
+    Both stages keep pass/reject counters, see `stats()`.
+    """
+    def __init__(self, extra_terms=DEFAULT_EXTRA_TERMS, path=DISASTER_TYPES_FILE):
+        self.terms = load_disaster_terms(path, extra_terms)
+        pattern = _trie_pattern(self.terms)
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.bytes_pattern = re.compile(pattern.encode('utf-8'), re.IGNORECASE)
+        # raw commits passed/rejected, posts passed/rejected
+        self.counts = [0, 0, 0, 0]
+
+    def match_bytes(self, data):
+        if self.bytes_pattern.search(data):
+            self.counts[0] += 1
+            return True
+        self.counts[1] += 1
+        return False
+
+    def match(self, text):
+        if text and self.pattern.search(text):
+            self.counts[2] += 1
+            return True
+        self.counts[3] += 1
+        return False
+
+    def stats(self):
+        return prefilter_stats(self.counts)
+
+def prefilter_stats(counts):
+    """Turn raw prefilter counters into a readable dict with the reduction factor."""
+    raw_passed, raw_rejected, passed, rejected = counts
+    # Raw-rejected commits count once, posts of raw-passed commits are counted individually
+    seen = raw_rejected + passed + rejected
+    return {
+        'commits_passed': raw_passed,
+        'commits_rejected': raw_rejected,
+        'posts_passed': passed,
+        'posts_rejected': rejected,
+        'reduction_factor': round(seen / passed, 2) if passed else None,
+    }
+
+# ==============================================================================
+# Author Handle Resolution
+# ==============================================================================
+
+class DidHandleCache:
+    """
+    DID -> handle cache in a local SQLite file with a TTL.
+
+    SQLite handles locking between processes, so every scraper process on the
+    box can point at the same file and share lookups, and the cache survives
+    restarts. Connections are opened lazily per process.
+    """
+    def __init__(self, path="did_handles.sqlite", ttl=86400):
+        self.path = path
+        self.ttl = ttl
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Connections and locks can't cross process boundaries
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS did_handles "
+                "(did TEXT PRIMARY KEY, handle TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get_many(self, dids):
+        """Return {did: handle} for the DIDs that have an unexpired entry."""
+        dids = list(dids)
+        handles = {}
+        try:
+            with self._lock:
+                conn = self._connect()
+                # Stay well below SQLite's bound-parameter limit
+                for i in range(0, len(dids), 500):
+                    chunk = dids[i:i + 500]
+                    rows = conn.execute(
+                        f"SELECT did, handle FROM did_handles WHERE expires_at > ? "
+                        f"AND did IN ({','.join('?' * len(chunk))})",
+                        [time.time(), *chunk]
+                    ).fetchall()
+                    handles.update(rows)
+        except Exception as e:
+            print(f"DID cache read failed: {e}")
+        return handles
+
+    def put_many(self, handles):
+        if not handles:
+            return
+        expires_at = time.time() + self.ttl
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO did_handles (did, handle, expires_at) VALUES (?, ?, ?)",
+                    [(did, handle, expires_at) for did, handle in handles.items()]
+                )
+                conn.commit()
+        except Exception as e:
+            print(f"DID cache write failed: {e}")
+
+def _split_cached(dids, cache):
+    dids = list(dict.fromkeys(d for d in dids if isinstance(d, str) and d.startswith('did:')))
+    handles = cache.get_many(dids) if cache else {}
+    return handles, [d for d in dids if d not in handles]
+
+def _store_resolved(resolved, cache):
+    # Resolvers fall back to the DID itself on failure, don't cache those
+    if cache:
+        cache.put_many({did: handle for did, handle in resolved.items() if handle != did})
+
+def resolve_handles(dids, resolve, cache=None, max_workers=8):
+    """
+    Resolve many DIDs to handles at once.
+
+    Cache hits are answered locally, the misses are resolved concurrently with
+    `resolve(did)` on a thread pool and written back to the cache.
+    Non-DID values (e.g. handles that are already resolved) are skipped.
+    """
+    handles, misses = _split_cached(dids, cache)
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(misses))) as pool:
+            resolved = dict(zip(misses, pool.map(resolve, misses)))
+        _store_resolved(resolved, cache)
+        handles.update(resolved)
+    return handles
+
+async def resolve_handles_async(dids, resolve, cache=None, concurrency=16):
+    """Same as `resolve_handles` for an async `resolve(did)` coroutine."""
+    handles, misses = _split_cached(dids, cache)
+    if misses:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _resolve(did):
+            async with semaphore:
+                return await resolve(did)
+
+        resolved = dict(zip(misses, await asyncio.gather(*(_resolve(d) for d in misses))))
+        _store_resolved(resolved, cache)
+        handles.update(resolved)
+    return handles
@@ -0,0 +1,143 @@
+"""
+Fuzzy toponym index, the local replacement for the ilike '%term%' fallback
+of the gazetteer lookups.
+
+Trigram inverted lists over the lowercased names and alternate names of
+the populated places (PPL*) of a gazetteer. A query's candidates are the
+terms that share enough of its trigrams (one edit destroys at most 3) and
+whose length is within the distance bound; they are verified with a
+bounded Levenshtein distance (rapidfuzz when installed) and ranked by
+distance, then population, then file order.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from rapidfuzz.distance import Levenshtein
+except ImportError:
+    Levenshtein = None
+
+from gazetteer import load_gazetteer
+from gazetteer_engine import RECORD_FIELDS
+
+DEFAULT_MAX_DISTANCE = 2
+
+def trigrams(text):
+    """Distinct trigrams of `text` padded like pg_trgm (two spaces before, one after)."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _bounded_levenshtein(a, b, max_distance):
+    """Edit distance of a and b, or max_distance + 1 once it is certainly larger."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+def edit_distance(a, b, max_distance):
+    if Levenshtein is not None:
+        return Levenshtein.distance(a, b, score_cutoff=max_distance)
+    return _bounded_levenshtein(a, b, max_distance)
+
+class FuzzyToponymIndex:
+    """Ranked fuzzy matches of a location string against gazetteer place names."""
+    def __init__(self, gazetteer_df, max_distance=DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+
+        places = gazetteer_df[gazetteer_df["featureCode"].fillna("").str.upper().str.startswith("PPL")]
+        names = places["name"].dropna().str.strip().str.lower()
+        alternates = places["alternate_list"].explode().dropna().str.strip().str.lower()
+        terms = pd.concat([names, alternates]).rename("term").rename_axis("row").reset_index()
+        terms = terms[terms["term"] != ""]
+        terms["population"] = gazetteer_df["population"].reindex(terms["row"]).to_numpy()
+        # One entry per term, its most populous place; term ids then follow population order
+        terms = terms.sort_values(["population", "row"], ascending=[False, True], kind="mergesort") \
+            .drop_duplicates("term")
+
+        rows, self._term_record = np.unique(terms["row"].to_numpy(), return_inverse=True)
+        records = gazetteer_df.loc[rows, list(RECORD_FIELDS)].astype(object)
+        self._records = list(records.where(records.notna(), None).itertuples(index=False, name=None))
+        self.terms = terms["term"].tolist()
+        self._lengths = np.fromiter(map(len, self.terms), dtype=np.int32, count=len(self.terms))
+
+        # Inverted lists as one array of term ids sorted by trigram, then term length, with
+        # a parallel key (trigram id * stride + length) so one searchsorted finds the slice
+        # of every query trigram's list within the length bound
+        self._gram_ids = {}
+        gram_of_pair, term_of_pair = [], []
+        for term_id, term in enumerate(self.terms):
+            for gram in trigrams(term):
+                gram_of_pair.append(self._gram_ids.setdefault(gram, len(self._gram_ids)))
+                term_of_pair.append(term_id)
+        gram_of_pair = np.array(gram_of_pair, dtype=np.int64)
+        term_of_pair = np.array(term_of_pair, dtype=np.int32)
+        self._stride = int(self._lengths.max(initial=0)) + 2
+        order = np.lexsort((term_of_pair, self._lengths[term_of_pair], gram_of_pair))
+        self._postings = term_of_pair[order]
+        self._keys = gram_of_pair[order] * self._stride + self._lengths[self._postings]
+
+    @classmethod
+    def from_file(cls, path, max_distance=DEFAULT_MAX_DISTANCE):
+        """Index a GeoNames TSV or a compiled .gaz artifact."""
+        return cls(load_gazetteer(path), max_distance=max_distance)
+
+    def candidates(self, text, max_distance=None, limit=10):
+        """
+        Up to `limit` (term, distance, record) within `max_distance` edits of
+        `text`, best first. The distance is also capped at a third of the
+        text's length, so short strings only match near-exactly.
+        """
+        query = text.strip().lower()
+        max_distance = self.max_distance if max_distance is None else max_distance
+        max_distance = min(max_distance, len(query) // 3)
+        query_grams = trigrams(query)
+        # Every edit destroys at most 3 of the query's trigrams
+        needed = max(len(query_grams) - 3 * max_distance, 1)
+        grams = np.array([self._gram_ids[gram] for gram in query_grams if gram in self._gram_ids], dtype=np.int64)
+        if len(grams) < needed:
+            return []
+
+        # Lengths stay below the stride, so the bounds never reach into the next trigram's list
+        min_length = min(max(len(query) - max_distance, 0), self._stride - 1)
+        max_length = min(len(query) + max_distance + 1, self._stride - 1)
+        bounds = np.searchsorted(self._keys, np.concatenate([
+            grams * self._stride + min_length, grams * self._stride + max_length,
+        ])).tolist()
+        lists = sorted((self._postings[bounds[i]:bounds[i + len(grams)]] for i in range(len(grams))), key=len)
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.terms))
+        # A term in `needed` of the lists is in one of the shortest len(lists) - needed + 1
+        found = np.concatenate(lists[:len(lists) - needed + 1])
+        found = np.unique(found[shared[found] >= needed])
+
+        matches = []
+        for term_id in found.tolist():
+            distance = edit_distance(query, self.terms[term_id], max_distance)
+            if distance <= max_distance:
+                matches.append((distance, term_id))
+        matches.sort()
+        return [(self.terms[term_id], distance, self.record(term_id)) for distance, term_id in matches[:limit]]
+
+    def best(self, text, max_distance=None):
+        """Record of the best fuzzy match of `text`, or None."""
+        found = self.candidates(text, max_distance=max_distance, limit=1)
+        return found[0][2] if found else None
+
+    def record(self, term_id):
+        return dict(zip(RECORD_FIELDS, self._records[self._term_record[term_id]]))
+
+    def stats(self):
+        return {
+            'terms': len(self.terms),
+            'places': len(self._records),
+            'trigrams': len(self._gram_ids),
+            'postings': len(self._postings),
+            'rapidfuzz': Levenshtein is not None,
+        }
@@ -117,6 +117,11 @@ dtypes = {
 }
 
 def load_gazetteer(filename): #"../data/US.txt"
+    if filename.endswith(".gaz"):
+        # Compiled artifact, see gazetteer_artifact.py: no TSV to parse
+        from gazetteer_artifact import GazetteerArtifact
+        return GazetteerArtifact(filename).to_dataframe()
+
     gazetteer_df = pd.read_csv(filename, 
                             sep="\t",
                             names=columns,
@@ -159,6 +164,71 @@ def build_location_dict(gazetteer_df):
                     location_dict.setdefault(alt_lower, []).append(i)
     return location_dict
 
+LOCATION_FIELDS = ("city", "state", "region", "country")
+
+def build_location_index(gazetteer_df):
+    """
+    Vectorized replacement for build_location_dict + lookup_city_state_country:
+    {normalized name: (city, state, region, country)}.
+
+    Every name and alternate name becomes a (key, row) pair with explode, each
+    key keeps its most populous row (the earlier row on a tie) and that row is
+    resolved the way lookup_city_state_country resolves it, all ahead of time.
+    Identical results share one tuple.
+    """
+    names = gazetteer_df["name"].dropna().str.lower()
+    alternates = gazetteer_df["alternate_list"].explode().dropna().str.strip().str.lower()
+    alternates = alternates[alternates != ""]
+
+    pairs = pd.concat([names, alternates]).rename("key").rename_axis("row").reset_index()
+    pairs["population"] = gazetteer_df["population"].reindex(pairs["row"]).to_numpy()
+    winners = pairs.sort_values(["population", "row"], ascending=[False, True], kind="mergesort") \
+        .drop_duplicates("key")
+
+    best = gazetteer_df.loc[winners["row"], ["name", "featureCode", "countryCode", "stateCode"]] \
+        .reset_index(drop=True).astype(object)
+    best = best.where(best.notna(), None)
+    key = winners["key"].reset_index(drop=True).astype(object)
+
+    feature = best["featureCode"].fillna("")
+    is_state = feature == "ADM1"
+    is_place = ~is_state & (feature.str.startswith("PPL") | feature.str.startswith("ADM"))
+    state_name = best["stateCode"].map(US_STATE_NAMES)
+
+    city = best["name"].where(~is_state, None)
+    state = pd.Series(None, index=key.index, dtype=object)
+    state[is_state] = state_name[is_state].where(state_name[is_state].notna(), best["stateCode"][is_state])
+    state[is_place] = state_name[is_place]
+    state = state.where(state.notna() & (state != ""), None)
+
+    # No state: no city either, and the text itself is the region unless it names a state
+    no_state = state.isna()
+    city[no_state] = None
+    all_us_states = [s.lower() for s in US_STATE_NAMES.values()] + [code.lower() for code in US_STATE_NAMES]
+    region = pd.Series(None, index=key.index, dtype=object)
+    has_region = no_state & ~key.isin(all_us_states)
+    region[has_region] = key[has_region].str.title()
+
+    # A region naming a state gets that state, the first one in US_STATE_NAMES order
+    region_lower = region[has_region].str.lower()
+    unassigned = pd.Series(True, index=region_lower.index)
+    for state_us in US_STATE_NAMES.values():
+        found = unassigned & region_lower.str.contains(state_us.lower(), regex=False)
+        state[found[found].index] = state_us
+        unassigned &= ~found
+
+    columns = [column.where(column.notna(), None) for column in (city, state, region, best["countryCode"])]
+    shared = {}
+    results = [shared.setdefault(result, result) for result in zip(*columns)]
+    return dict(zip(key, results))
+
+def lookup_location(loc_text, location_index):
+    """lookup_city_state_country against a build_location_index index: one dict access."""
+    if not loc_text:
+        return None
+    result = location_index.get(loc_text.lower().strip())
+    return dict(zip(LOCATION_FIELDS, result)) if result else None
+
 def lookup_city_state_country(loc_text, gaz_df, loc_dict):
     if not loc_text:
         return None
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Compact binary gazetteer, compiled once from the GeoNames TSV and memory-mapped at startup.
+
+    python gazetteer_artifact.py ../../data/US.txt ../../data/US.gaz
+
+The file is a JSON header followed by aligned little-endian arrays that
+GazetteerArtifact maps read-only with np.frombuffer, so opening it parses
+nothing and every process mapping the same file shares its pages.
+
+    geonameid, latitude, longitude, population   one fixed-width value per row
+    featureCode, countryCode, stateCode          uint16 codes into a string table, 0 = missing
+    name                                         string column (offsets + UTF-8 blob)
+    alternates                                   per-row offsets into a string column of
+                                                 the individual alternate names
+    places.*, place_names.*, elements.*          the LocalGazetteer indexes (see
+                                                 gazetteer_engine.py) as sorted string
+                                                 columns and row arrays
+
+A string column NAME is two arrays: NAME.offsets (n + 1 byte offsets) and
+NAME.blob (the concatenated UTF-8 bytes). Sorted columns are in code point
+order, which is also UTF-8 byte order, so they are searched on raw bytes.
+"""
+
+import re
+import sys
+import json
+import mmap
+import time
+import struct
+
+import numpy as np
+import pandas as pd
+
+ARTIFACT_SUFFIX = ".gaz"
+MAGIC = b"GAZART01"
+ALIGNMENT = 64
+
+CODE_COLUMNS = ("featureCode", "countryCode", "stateCode")
+NUMERIC_COLUMNS = {"geonameid": "<i8", "latitude": "<f8", "longitude": "<f8", "population": "<i8"}
+
+# One UTF-8 character other than a newline, what "_" matches in an ilike pattern
+_UTF8_CHAR = rb"(?:[^\n\x80-\xff]|[\xc0-\xff][\x80-\xbf]*)"
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _pack_strings(strings):
+    """(offsets, blob) arrays for a string column."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    dtype = "<u4" if offsets[-1] < 2 ** 32 else "<u8"
+    return offsets.astype(dtype), np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+def build_arrays(gazetteer_df):
+    """Every array of the artifact, from a load_gazetteer DataFrame."""
+    arrays = {}
+    n = len(gazetteer_df)
+
+    for column, dtype in NUMERIC_COLUMNS.items():
+        arrays[column] = gazetteer_df[column].to_numpy(dtype=dtype)
+    for column in CODE_COLUMNS:
+        codes, table = pd.factorize(gazetteer_df[column], use_na_sentinel=True)
+        arrays[column] = (codes + 1).astype("<u2" if len(table) < 2 ** 16 - 1 else "<u4")
+        arrays[f"{column}.table.offsets"], arrays[f"{column}.table.blob"] = _pack_strings([""] + list(table))
+
+    # A missing name is stored as "" and read back as None
+    names = gazetteer_df["name"].fillna("").tolist()
+    arrays["name.offsets"], arrays["name.blob"] = _pack_strings(names)
+
+    alternate_lists = gazetteer_df["alternate_list"].tolist()
+    counts = np.fromiter((len(alternates) for alternates in alternate_lists), dtype=np.int64, count=n)
+    row_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=row_offsets[1:])
+    arrays["alternates.rows"] = row_offsets.astype("<u4" if row_offsets[-1] < 2 ** 32 else "<u8")
+    arrays["alternates.offsets"], arrays["alternates.blob"] = _pack_strings(
+        alternate for alternates in alternate_lists for alternate in alternates
+    )
+
+    # The LocalGazetteer indexes over the PPL* rows, same tie-breaking (file order)
+    features = gazetteer_df["featureCode"].fillna("").tolist()
+    populations = gazetteer_df["population"].tolist()
+    place_rows = [i for i, feature in enumerate(features) if feature.upper().startswith("PPL")]
+
+    place_by_name = {}
+    for i in place_rows:
+        if names[i]:
+            place_by_name.setdefault(names[i], i)
+
+    place_rows.sort(key=lambda i: -populations[i])
+    texts = [",".join(alternate_lists[i]).lower() for i in place_rows]
+    place_by_element = {}
+    for i, text in zip(place_rows, texts):
+        for element in text.split(",")[1:-1]:
+            place_by_element.setdefault(element, i)
+
+    arrays["places.rows"] = np.array(place_rows, dtype="<i4")
+    # Newline-terminated so a substring match never spans two places
+    arrays["places.offsets"], arrays["places.blob"] = _pack_strings(text + "\n" for text in texts)
+    for name, index in (("place_names", place_by_name), ("elements", place_by_element)):
+        keys = sorted(index)
+        arrays[f"{name}.offsets"], arrays[f"{name}.blob"] = _pack_strings(keys)
+        arrays[f"{name}.rows"] = np.array([index[key] for key in keys], dtype="<i4")
+    return arrays
+
+def write_artifact(arrays, path, rows, source=None):
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {"dtype": array.dtype.str, "offset": offset, "count": len(array)}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({"rows": rows, "source": source, "arrays": layout}).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+
+def compile_gazetteer(source, path):
+    """Parse a GeoNames TSV and write its artifact to `path`."""
+    from gazetteer import load_gazetteer
+
+    gazetteer_df = load_gazetteer(source)
+    write_artifact(build_arrays(gazetteer_df), path, len(gazetteer_df), source=source)
+    return len(gazetteer_df)
+
+class GazetteerArtifact:
+    """A compiled gazetteer, memory-mapped read-only."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a gazetteer artifact")
+        (header_length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mmap[header_start:header_start + header_length])
+        self.rows = header["rows"]
+        self.source = header["source"]
+        self._data_start = _align(header_start + header_length)
+        self._layout = header["arrays"]
+        self._arrays = {}
+        self._tables = {
+            column: [self.string(f"{column}.table", i) or None for i in range(self.size(f"{column}.table"))]
+            for column in CODE_COLUMNS
+        }
+
+    def array(self, name):
+        """A named array as a read-only view of the mapping."""
+        array = self._arrays.get(name)
+        if array is None:
+            spec = self._layout[name]
+            array = self._arrays[name] = np.frombuffer(
+                self._mmap, dtype=spec["dtype"], count=spec["count"], offset=self._data_start + spec["offset"]
+            )
+        return array
+
+    def _blob_start(self, name):
+        return self._data_start + self._layout[f"{name}.blob"]["offset"]
+
+    def size(self, name):
+        """Number of strings in a string column."""
+        return self._layout[f"{name}.offsets"]["count"] - 1
+
+    def raw(self, name, i):
+        offsets = self.array(f"{name}.offsets")
+        start = self._blob_start(name)
+        return self._mmap[start + int(offsets[i]):start + int(offsets[i + 1])]
+
+    def string(self, name, i):
+        return self.raw(name, i).decode("utf-8")
+
+    def search(self, name, key):
+        """Row of `key` in a sorted string column's NAME.rows, or None."""
+        key = key.encode("utf-8")
+        lo, hi = 0, self.size(name)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(name, mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.size(name) and self.raw(name, lo) == key:
+            return int(self.array(f"{name}.rows")[lo])
+        return None
+
+    def find(self, name, text):
+        """Index of the first string of a string column containing `text` (ilike wildcards allowed), or None."""
+        start = self._blob_start(name)
+        end = start + int(self.array(f"{name}.offsets")[-1])
+        if re.search(r"[%_*]", text):
+            pattern = b"".join(
+                _UTF8_CHAR if c == "_" else b".*" if c in "%*" else re.escape(c.encode("utf-8")) for c in text
+            )
+            found = re.compile(pattern).search(self._mmap, start, end)
+            pos = found.start() if found else -1
+        else:
+            pos = self._mmap.find(text.encode("utf-8"), start, end)
+        if pos < 0:
+            return None
+        return int(np.searchsorted(self.array(f"{name}.offsets"), pos - start, side="right")) - 1
+
+    def code(self, column, i):
+        return self._tables[column][self.array(column)[i]]
+
+    def code_of(self, column, value):
+        """The code `value` is stored as in `column`, -1 if no row has it."""
+        table = self._tables[column]
+        return table.index(value) if value in table else -1
+
+    def name(self, i):
+        return self.string("name", i) or None
+
+    def alternates(self, i):
+        rows = self.array("alternates.rows")
+        return [self.string("alternates", j) for j in range(int(rows[i]), int(rows[i + 1]))]
+
+    def record(self, i, fields):
+        """Row `i` as a dict of `fields` with Python values."""
+        record = {}
+        for field in fields:
+            if field == "name":
+                record[field] = self.name(i)
+            elif field in CODE_COLUMNS:
+                record[field] = self.code(field, i)
+            else:
+                record[field] = self.array(field)[i].item()
+        return record
+
+    def _column_strings(self, name):
+        offsets = self.array(f"{name}.offsets").tolist()
+        start = self._blob_start(name)
+        blob = self._mmap[start:start + offsets[-1]]
+        return [blob[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+
+    def to_dataframe(self):
+        """The load_gazetteer DataFrame, without parsing the TSV."""
+        alternates = self._column_strings("alternates")
+        rows = self.array("alternates.rows").tolist()
+        data = {
+            "geonameid": np.array(self.array("geonameid")),
+            "name": pd.array([s or None for s in self._column_strings("name")], dtype="string"),
+            "alternate_list": [alternates[a:b] for a, b in zip(rows[:-1], rows[1:])],
+        }
+        for column in CODE_COLUMNS:
+            table = np.array(self._tables[column], dtype=object)
+            data[column] = pd.array(table[self.array(column)], dtype="string")
+        for column in ("latitude", "longitude", "population"):
+            data[column] = np.array(self.array(column))
+        return pd.DataFrame(data)[[
+            "geonameid", "name", "alternate_list", "countryCode", "stateCode",
+            "latitude", "longitude", "featureCode", "population",
+        ]]
+
+def main(argv):
+    if len(argv) != 3:
+        print(f"usage: {argv[0]} GEONAMES_TSV OUTPUT{ARTIFACT_SUFFIX}")
+        return 2
+    start = time.perf_counter()
+    rows = compile_gazetteer(argv[1], argv[2])
+    print(f"Compiled {rows} rows from {argv[1]} into {argv[2]} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,16 +1,38 @@
 import os
+import re
+import threading
+from collections import OrderedDict
 from supabase import create_client, Client
 from dotenv import load_dotenv
 from typing import Optional, Dict, Any, List
 from functools import lru_cache
 from flask import Flask, request, jsonify
 
+from gazetteer_artifact import ARTIFACT_SUFFIX
+
 load_dotenv()
 
 url: str = os.environ.get('SUPABASE_URL')
 key: str = os.environ.get("SUPABASE_KEY")
 supabase: Client = create_client(url, key)
 
+# GAZETTEER_FUZZY=1 replaces the ilike '%term%' fallback with an in-process fuzzy index of
+# GAZETTEER_FILE (see fuzzy_index.py), matching within FUZZY_MAX_EDIT_DISTANCE edits.
+# A compiled .gaz artifact (see gazetteer_artifact.py) is preferred over US.txt when present
+GAZETTEER_FUZZY = os.environ.get("GAZETTEER_FUZZY", "0") == "1"
+FUZZY_MAX_EDIT_DISTANCE = int(os.environ.get("FUZZY_MAX_EDIT_DISTANCE", 2))
+GAZETTEER_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+GAZETTEER_FILE = os.environ.get("GAZETTEER_FILE")
+if not GAZETTEER_FILE:
+    GAZETTEER_FILE = os.path.join(GAZETTEER_DATA_DIR, "US" + ARTIFACT_SUFFIX)
+    if not os.path.exists(GAZETTEER_FILE):
+        GAZETTEER_FILE = os.path.join(GAZETTEER_DATA_DIR, "US.txt")
+fuzzy_index = None
+if GAZETTEER_FUZZY:
+    from fuzzy_index import FuzzyToponymIndex
+    fuzzy_index = FuzzyToponymIndex.from_file(GAZETTEER_FILE, max_distance=FUZZY_MAX_EDIT_DISTANCE)
+    print("Fuzzy index:", fuzzy_index.stats())
+
 app = Flask(__name__)
 
 US_STATE_NAMES = {
@@ -83,51 +105,67 @@ state_coordinates = {
     'District of Columbia': ('38.9101', '-77.0147')
 }
 
-@lru_cache(maxsize=2048)
-def lookup_city_state_country(loc_text: str):
-    norm = loc_text
-    print(norm)
-    def _run_query(builder) -> List[Dict[str, Any]]:
-        try:
-            resp = builder.execute()
-            return resp.data or []
-        except Exception as e:
-            print("Supabase query failed:", e)
-            return []
+GAZETTEER_FIELDS = "name, featureCode, stateCode, countryCode, latitude, longitude"
+
+# Batch lookups send up to LOOKUP_BATCH_SIZE strings per query; a result of LOOKUP_BATCH_ROWS
+# rows may be truncated, so strings it doesn't answer fall back to the per-string cascade
+LOOKUP_BATCH_SIZE = int(os.environ.get("LOOKUP_BATCH_SIZE", 100))
+LOOKUP_BATCH_ROWS = int(os.environ.get("LOOKUP_BATCH_ROWS", 1000))
 
+# lookup_many results, least recently used evicted first
+LOOKUP_CACHE_SIZE = int(os.environ.get("LOOKUP_CACHE_SIZE", 2048))
+_lookup_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_lookup_cache_lock = threading.Lock()
 
+# ilike wildcards and escape, strings containing them can't be matched client-side
+LIKE_SPECIAL = re.compile(r"[%_*\\]")
+
+def _run_query(builder) -> Optional[List[Dict[str, Any]]]:
+    """Rows of a query, None if it failed."""
+    try:
+        resp = builder.execute()
+        return resp.data or []
+    except Exception as e:
+        print("Supabase query failed:", e)
+        return None
+
+def exact_record(norm: str) -> Optional[Dict[str, Any]]:
+    """The most populous PPL*/ADM* record named exactly norm."""
     resp = (
         supabase.table("gazetteer")
-        .select(
-            "name, featureCode, stateCode, countryCode, latitude, longitude"
-        )
+        .select(GAZETTEER_FIELDS)
         .eq("name", norm)
         .or_("featureCode.ilike.PPL%,featureCode.ilike.ADM%")
         .order("population", desc=True)
         .limit(1)
         .execute()
     )
+    return resp.data[0] if resp.data else None
 
-    if not resp.data:
-        print("First query returned no data, trying ilike and alternate_list")
-        resp = (
-            supabase.table("gazetteer")
-            .select("name, featureCode, stateCode, countryCode, latitude, longitude")
-            .ilike("alternate_list", f"%{norm}%")
-            .ilike("featureCode", "PPL%")
-            .or_(
-                f"name.ilike.%{norm}%,featureCode.eq.ADM1,featureCode.eq.ADM2")
-            .order("population", desc=True)
-            .limit(1)
-            .execute()
-        )
-
-    print(resp.data if resp.data else "No data found")
+def fallback_record(norm: str) -> Optional[Dict[str, Any]]:
+    """The most populous PPL* with norm in its name and alternate names, or the fuzzy index's best match."""
+    if fuzzy_index is not None:
+        print("First query returned no data, trying the fuzzy index")
+        return fuzzy_index.best(norm)
+    print("First query returned no data, trying ilike and alternate_list")
+    resp = (
+        supabase.table("gazetteer")
+        .select(GAZETTEER_FIELDS)
+        .ilike("alternate_list", f"%{norm}%")
+        .ilike("featureCode", "PPL%")
+        .or_(
+            f"name.ilike.%{norm}%,featureCode.eq.ADM1,featureCode.eq.ADM2")
+        .order("population", desc=True)
+        .limit(1)
+        .execute()
+    )
+    return resp.data[0] if resp.data else None
 
+def resolve_record(norm: str, record: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """city/state/region/country/coordinates for norm from its matched gazetteer record."""
     city = state = region = place = state_code = country_code = latitude = longitude = None
 
-    if resp.data:
-        record = resp.data[0]
+    if record:
         feature = (record.get('featureCode') or "").upper()
         place = record.get('name')
         state_code = record.get('stateCode')
@@ -171,17 +209,137 @@ def lookup_city_state_country(loc_text: str):
         "longitude": longitude
     }
 
+@lru_cache(maxsize=2048)
+def lookup_city_state_country(loc_text: str):
+    norm = loc_text
+    print(norm)
+    record = exact_record(norm)
+    if record is None:
+        record = fallback_record(norm)
+    print(record if record else "No data found")
+    return resolve_record(norm, record)
+
+def _chunks(items: List[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _like_any(norms: List[str]) -> str:
+    """A PostgREST ilike(any) array of %norm% patterns."""
+    return "{" + ",".join('"%' + norm.replace('"', '\\"') + '%"' for norm in norms) + "}"
 
-def standardize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+def batch_exact_records(norms: List[str]):
+    """
+    exact_record for many strings, one IN query per chunk. Returns the found
+    records and the strings whose answer is unknown (failed or truncated query);
+    the others have no exact match.
+    """
+    found: Dict[str, Dict[str, Any]] = {}
+    unknown: List[str] = []
+    for chunk in _chunks(norms, LOOKUP_BATCH_SIZE):
+        rows = _run_query(
+            supabase.table("gazetteer")
+            .select(GAZETTEER_FIELDS)
+            .in_("name", chunk)
+            .or_("featureCode.ilike.PPL%,featureCode.ilike.ADM%")
+            .order("population", desc=True)
+            .limit(LOOKUP_BATCH_ROWS)
+        )
+        if rows is None:
+            unknown += chunk
+            continue
+        # Most populous first: a name in the result has its best row, even if the result was cut off
+        for record in rows:
+            found.setdefault(record.get("name"), record)
+        if len(rows) >= LOOKUP_BATCH_ROWS:
+            unknown += [norm for norm in chunk if norm not in found]
+    return found, unknown
+
+def batch_fallback_records(norms: List[str]):
+    """
+    fallback_record's ilike query for many strings, one ilike(any) query per
+    chunk with the pattern each row matched worked out client-side. Same
+    return as batch_exact_records.
+    """
+    found: Dict[str, Dict[str, Any]] = {}
+    unknown = [norm for norm in norms if LIKE_SPECIAL.search(norm)]
+    plain = [norm for norm in norms if not LIKE_SPECIAL.search(norm)]
+    for chunk in _chunks(plain, LOOKUP_BATCH_SIZE):
+        patterns = _like_any(chunk)
+        rows = _run_query(
+            supabase.table("gazetteer")
+            .select(GAZETTEER_FIELDS + ", alternate_list")
+            .filter("alternate_list", "ilike(any)", patterns)
+            .filter("name", "ilike(any)", patterns)
+            .ilike("featureCode", "PPL%")
+            .order("population", desc=True)
+            .limit(LOOKUP_BATCH_ROWS)
+        )
+        if rows is None:
+            unknown += chunk
+            continue
+        for norm in chunk:
+            needle = norm.lower()
+            record = next((r for r in rows if needle in (r.get("alternate_list") or "").lower()
+                           and needle in (r.get("name") or "").lower()), None)
+            if record is not None:
+                found[norm] = record
+            elif len(rows) >= LOOKUP_BATCH_ROWS:
+                unknown.append(norm)
+    return found, unknown
+
+def lookup_many(loc_texts: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    lookup_city_state_country for many strings, {loc_text: result}. Each
+    distinct string not in the cache is resolved once: exact names with one
+    IN query, the misses' alternate names with one ilike(any) query (or the
+    fuzzy index), and only strings those can't settle go through the
+    per-string cascade.
+    """
+    distinct = list(dict.fromkeys(loc for loc in loc_texts if loc))
+    with _lookup_cache_lock:
+        results = {norm: _lookup_cache[norm] for norm in distinct if norm in _lookup_cache}
+        for norm in results:
+            _lookup_cache.move_to_end(norm)
+    pending = [norm for norm in distinct if norm not in results]
+    if not pending:
+        return results
+
+    records, unknown = batch_exact_records(pending)
+    unknown_set = set(unknown)
+    misses = [norm for norm in pending if norm not in records and norm not in unknown_set]
+    if fuzzy_index is not None:
+        records.update((norm, fuzzy_index.best(norm)) for norm in misses)
+    else:
+        found, unknown_fallbacks = batch_fallback_records(misses)
+        records.update(found)
+        for norm in unknown_fallbacks:
+            records[norm] = fallback_record(norm)
+    print(f"Batch lookup: {len(loc_texts)} strings, {len(pending)} distinct uncached, "
+          f"{len(misses)} without an exact match, {len(unknown)} looked up one by one")
+
+    looked_up = {norm: lookup_city_state_country(norm) for norm in unknown}
+    looked_up.update((norm, resolve_record(norm, records.get(norm))) for norm in pending if norm not in looked_up)
+    with _lookup_cache_lock:
+        _lookup_cache.update(looked_up)
+        while len(_lookup_cache) > LOOKUP_CACHE_SIZE:
+            _lookup_cache.popitem(last=False)
+    results.update(looked_up)
+    return results
+
+
+def standardize_row(row: Dict[str, Any], matches: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
     """
     row["locations"] should be a list of raw location strings.
     Returns a dict with 'city','state','region','country','all_locations'.
+    `matches` are lookup_many results covering them, looked up here if not given.
     """
     locs = row.get("locations") or []
+    if matches is None:
+        matches = lookup_many(locs)
     results: List[Dict[str, Any]] = []
 
     for loc in locs:
-        match = lookup_city_state_country(loc)
+        match = matches.get(loc)
         if match and match.get("state"):
             results.append({
                 "location": loc,
@@ -220,6 +378,24 @@ def lookup():
     print("result", result)
     return jsonify(result), 200
 
+@app.route("/lookup_batch", methods=["POST"])
+def lookup_batch():
+    """
+    {"rows": [{"locations": [...]}, ...]} -> {"results": [/lookup result per row]}
+    {"locations": [...]} -> {"matches": {location: match}}
+    Every location string of the request is looked up once, see lookup_many.
+    """
+    payload = request.get_json(force=True, silent=True) or {}
+    rows = payload.get("rows")
+    if isinstance(rows, list) and rows:
+        rows = [row if isinstance(row, dict) else {} for row in rows]
+        matches = lookup_many([loc for row in rows for loc in (row.get("locations") or [])])
+        return jsonify({"results": [standardize_row(row, matches) for row in rows]}), 200
+    locations = payload.get("locations")
+    if isinstance(locations, list) and locations:
+        return jsonify({"matches": lookup_many(locations)}), 200
+    return jsonify({"error": "No rows or locations provided"}), 400
+
 if __name__ == "__main__":
     from waitress import serve
     print("Starting Gazetteer service on port 8000...")
@@ -0,0 +1,252 @@
+"""
+Gazetteer backends for model_server's location lookups.
+
+Both run the same match cascade (match()) for a stripped location string:
+
+    1) a US state code or name: the ADM1 record with that stateCode or name
+    2) otherwise a populated place (featureCode PPL*) named exactly norm.title()
+    3) else, for more than 2 characters, the most populous PPL* whose
+       alternate_list has norm.lower() as a comma-anchored element
+    4) else, for more than 3 characters, the most populous PPL* whose
+       alternate_list contains norm.lower() anywhere, or with a fuzzy index
+       attached (fuzzy_index.py) the closest PPL* name or alternate name
+       within its edit distance
+
+SupabaseGazetteer runs one PostgREST query per step. LocalGazetteer answers
+the same steps in-process from the GeoNames file gazetteer.load_gazetteer
+parses: steps 1-3 are dict lookups and step 4 one str.find over the
+alternate names of every PPL* row, concatenated in population order.
+MappedGazetteer answers them from the same indexes precompiled into a
+memory-mapped artifact (gazetteer_artifact.py), so it starts instantly and
+worker processes share one copy.
+"""
+
+import re
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+from gazetteer import US_STATE_NAMES, load_gazetteer
+from gazetteer_artifact import GazetteerArtifact
+
+RECORD_FIELDS = ("name", "featureCode", "stateCode", "countryCode", "latitude", "longitude")
+
+# ilike wildcards (PostgREST also accepts * for %)
+_LIKE_WILDCARDS = re.compile(r"[%_*]")
+
+class GazetteerBackend:
+    """The lookup cascade; subclasses implement its four steps, each returning a record dict or None."""
+    fuzzy = None  # a FuzzyToponymIndex answering step 4 instead of alternate_substring
+
+    def match(self, norm):
+        norm_up = norm.upper()
+        norm_title = norm.title()
+        norm_lower = norm.lower()
+
+        if norm_up in US_STATE_NAMES or norm_title in US_STATE_NAMES.values():
+            return self.state(norm_up, norm_title)
+        record = self.place(norm_title)
+        if record is None and len(norm) > 2:
+            record = self.alternate_element(norm_lower)
+        if record is None and len(norm) > 3:
+            record = self.fuzzy.best(norm_lower) if self.fuzzy else self.alternate_substring(norm_lower)
+        return record
+
+    def state(self, code, name):
+        raise NotImplementedError
+
+    def place(self, name):
+        raise NotImplementedError
+
+    def alternate_element(self, token):
+        raise NotImplementedError
+
+    def alternate_substring(self, text):
+        raise NotImplementedError
+
+class SupabaseGazetteer(GazetteerBackend):
+    """The cascade as PostgREST queries against the Supabase gazetteer table."""
+    def __init__(self, client):
+        self.client = client
+
+    def _select(self):
+        return self.client.table("gazetteer").select(", ".join(RECORD_FIELDS))
+
+    @staticmethod
+    def _first(resp):
+        return resp.data[0] if resp.data else None
+
+    def state(self, code, name):
+        return self._first(
+            self._select()
+            .eq("featureCode", "ADM1")
+            .or_(f"stateCode.eq.{code},name.eq.{name}")
+            .limit(1)
+            .execute()
+        )
+
+    def place(self, name):
+        return self._first(
+            self._select()
+            .eq("name", name)
+            .or_("featureCode.ilike.PPL%")
+            .limit(1)
+            .execute()
+        )
+
+    def alternate_element(self, token):
+        # alternate_list is a comma-separated list, so anchor with commas
+        return self.alternate_substring(f",{token},")
+
+    def alternate_substring(self, text):
+        return self._first(
+            self._select()
+            .ilike("alternate_list", f"%{text}%")
+            .ilike("featureCode", "PPL%")
+            .order("population", desc=True)
+            .limit(1)
+            .execute()
+        )
+
+def _is_populated_place(feature_code):
+    return feature_code.upper().startswith("PPL")
+
+class LocalGazetteer(GazetteerBackend):
+    """
+    The cascade over in-memory indexes of the ADM1 and PPL* rows of a GeoNames
+    file. Ties resolve to the earlier row in the file, the order the rows were
+    loaded into the Supabase table in.
+    """
+    def __init__(self, rows):
+        """`rows` are (record dict, population, alternate_list) in file order."""
+        self.records = []
+        self.adm1_by_code = {}
+        self.adm1_by_name = {}
+        self.place_by_name = {}
+        self.place_by_element = {}  # lowercased comma-anchored element -> most populous row
+        places = []                 # (population, row, lowercased alternate_list text)
+
+        for record, population, alternates in rows:
+            feature = record["featureCode"] or ""
+            if feature == "ADM1":
+                i = len(self.records)
+                self.records.append(record)
+                self.adm1_by_code.setdefault(record["stateCode"], i)
+                self.adm1_by_name.setdefault(record["name"], i)
+            elif _is_populated_place(feature):
+                i = len(self.records)
+                self.records.append(record)
+                self.place_by_name.setdefault(record["name"], i)
+                places.append((population, i, ",".join(alternates).lower()))
+
+        # Most populous first, file order within a population (the sort is stable)
+        places.sort(key=lambda place: -place[0])
+        for population, i, text in places:
+            # Only elements with a comma on both sides match ",token,"
+            for element in text.split(",")[1:-1]:
+                self.place_by_element.setdefault(element, i)
+
+        # One string to search for step 4, with each row's start offset
+        self._place_rows = [i for _, i, _ in places]
+        self._offsets = []
+        offset = 0
+        for _, _, text in places:
+            self._offsets.append(offset)
+            offset += len(text) + 1
+        self._alternates = "\n".join(text for _, _, text in places)
+
+    @classmethod
+    def from_file(cls, path):
+        """Index a GeoNames dump, e.g. data/US.txt."""
+        df = load_gazetteer(path)
+        rows = []
+        for row in df.itertuples(index=False):
+            record = {field: _value(getattr(row, field)) for field in RECORD_FIELDS}
+            rows.append((record, int(row.population), row.alternate_list))
+        return cls(rows)
+
+    def state(self, code, name):
+        rows = [i for i in (self.adm1_by_code.get(code), self.adm1_by_name.get(name)) if i is not None]
+        return dict(self.records[min(rows)]) if rows else None
+
+    def place(self, name):
+        i = self.place_by_name.get(name)
+        return dict(self.records[i]) if i is not None else None
+
+    def alternate_element(self, token):
+        if "," in token or _LIKE_WILDCARDS.search(token):
+            return self.alternate_substring(f",{token},")
+        i = self.place_by_element.get(token)
+        return dict(self.records[i]) if i is not None else None
+
+    def alternate_substring(self, text):
+        if _LIKE_WILDCARDS.search(text):
+            pattern = "".join(
+                "." if c == "_" else ".*" if c in "%*" else re.escape(c) for c in text
+            )
+            found = re.search(pattern, self._alternates)
+            pos = found.start() if found else -1
+        else:
+            pos = self._alternates.find(text)
+        if pos < 0:
+            return None
+        return dict(self.records[self._place_rows[bisect_right(self._offsets, pos) - 1]])
+
+    def stats(self):
+        return {
+            'records': len(self.records),
+            'states': len(self.adm1_by_code),
+            'places': len(self._place_rows),
+            'alternate_elements': len(self.place_by_element),
+        }
+
+class MappedGazetteer(GazetteerBackend):
+    """LocalGazetteer's cascade and tie-breaking over a GazetteerArtifact."""
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.adm1_by_code = {}
+        self.adm1_by_name = {}
+        # ADM1 rows are few, indexing them here costs nothing
+        for i in np.flatnonzero(artifact.array("featureCode") == artifact.code_of("featureCode", "ADM1")):
+            i = int(i)
+            self.adm1_by_code.setdefault(artifact.code("stateCode", i), i)
+            self.adm1_by_name.setdefault(artifact.name(i), i)
+
+    @classmethod
+    def from_file(cls, path):
+        """Map an artifact written by `python gazetteer_artifact.py`."""
+        return cls(GazetteerArtifact(path))
+
+    def _record(self, i):
+        return self.artifact.record(i, RECORD_FIELDS) if i is not None else None
+
+    def state(self, code, name):
+        rows = [i for i in (self.adm1_by_code.get(code), self.adm1_by_name.get(name)) if i is not None]
+        return self._record(min(rows)) if rows else None
+
+    def place(self, name):
+        return self._record(self.artifact.search("place_names", name))
+
+    def alternate_element(self, token):
+        if "," in token or _LIKE_WILDCARDS.search(token):
+            return self.alternate_substring(f",{token},")
+        return self._record(self.artifact.search("elements", token))
+
+    def alternate_substring(self, text):
+        place = self.artifact.find("places", text)
+        return self._record(int(self.artifact.array("places.rows")[place]) if place is not None else None)
+
+    def stats(self):
+        return {
+            'rows': self.artifact.rows,
+            'states': len(self.adm1_by_code),
+            'places': self.artifact.size("places"),
+            'alternate_elements': self.artifact.size("elements"),
+        }
+
+def _value(value):
+    """pandas NA/NaN to None, numpy scalars to Python ones."""
+    if value is None or pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
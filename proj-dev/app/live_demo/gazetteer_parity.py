@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Parity check of the in-process LocalGazetteer against the Supabase-backed
+lookup cascade (see gazetteer_engine.py).
+
+Every location string goes through both backends' match() and the matched
+records are compared field by field. The strings are the state names and
+codes, the `location` column of a posts CSV (filtered_posts.csv by
+default), any --locations file (one per line) and a random sample of names
+and alternate names from the gazetteer itself, in a few casings.
+
+    python gazetteer_parity.py --gazetteer ../../data/US.txt --sample 300
+"""
+
+import os
+import sys
+import csv
+import time
+import random
+import argparse
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from gazetteer import US_STATE_NAMES
+from gazetteer_engine import RECORD_FIELDS, LocalGazetteer, SupabaseGazetteer
+
+LIVE_DEMO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GAZETTEER = os.path.join(LIVE_DEMO_DIR, "..", "..", "data", "US.txt")
+
+def sample_locations(local, n, seed):
+    """Names and alternate names of random indexed places, as-is, lowercased and uppercased."""
+    rng = random.Random(seed)
+    records = rng.sample(local.records, min(n, len(local.records)))
+    elements = list(local.place_by_element)
+    names = [r["name"] for r in records if r["name"]]
+    names += rng.sample(elements, min(n, len(elements)))
+    return [variant for name in names for variant in (name, name.lower(), name.upper())]
+
+def csv_locations(path, column="location"):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row[column] for row in csv.DictReader(f) if row.get(column)]
+
+def same_record(a, b):
+    if a is None or b is None:
+        return a is b
+    for field in RECORD_FIELDS:
+        x, y = a.get(field), b.get(field)
+        if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+            if abs(x - y) > 1e-6:
+                return False
+        elif x != y:
+            return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--gazetteer', default=DEFAULT_GAZETTEER, help="GeoNames file the local index is built from")
+    parser.add_argument('--csv', default=os.path.join(LIVE_DEMO_DIR, "filtered_posts.csv"), help="Posts CSV with a location column")
+    parser.add_argument('--locations', help="File with one location string per line")
+    parser.add_argument('--sample', type=int, default=200, help="Places to sample from the gazetteer")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--show', type=int, default=20, help="Print this many mismatches")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = SupabaseGazetteer(create_client(os.environ.get('SUPABASE_URL'), os.environ.get('SUPABASE_KEY')))
+
+    start = time.perf_counter()
+    local = LocalGazetteer.from_file(args.gazetteer)
+    print(f"Indexed {args.gazetteer} in {time.perf_counter() - start:.1f}s: {local.stats()}")
+
+    locations = list(US_STATE_NAMES) + list(US_STATE_NAMES.values())
+    locations += csv_locations(args.csv)
+    if args.locations:
+        with open(args.locations, encoding='utf-8') as f:
+            locations += [line.strip() for line in f if line.strip()]
+    locations += sample_locations(local, args.sample, args.seed)
+    locations = list(dict.fromkeys(loc.strip() for loc in locations if loc.strip()))
+
+    mismatches, errors = [], []
+    local_seconds = db_seconds = 0.0
+    for norm in locations:
+        start = time.perf_counter()
+        local_record = local.match(norm)
+        local_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            db_record = db.match(norm)
+        except Exception as e:
+            errors.append((norm, e))
+            continue
+        finally:
+            db_seconds += time.perf_counter() - start
+        if not same_record(local_record, db_record):
+            mismatches.append((norm, local_record, db_record))
+
+    compared = len(locations) - len(errors)
+    print(f"{len(locations)} location strings, {compared} compared, {len(errors)} Supabase errors")
+    print(f"Local:    {local_seconds * 1e6 / len(locations):10.1f} us per lookup")
+    print(f"Supabase: {db_seconds * 1e6 / len(locations):10.1f} us per lookup")
+    print(f"Mismatches: {len(mismatches)} ({len(mismatches) / max(compared, 1):.1%})")
+    for norm, local_record, db_record in mismatches[:args.show]:
+        print(f"  {norm!r}\n    local:    {local_record}\n    supabase: {db_record}")
+    for norm, e in errors[:args.show]:
+        print(f"  {norm!r}: Supabase error {e}")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,7 +2,14 @@ import os
 import sys
 import gc
 import time
+import json
+import hashlib
 import logging
+import queue
+import sqlite3
+import signal
+import socket
+import threading
 import psutil
 import requests
 import os
@@ -10,20 +17,45 @@ from supabase import create_client, Client
 from dotenv import load_dotenv
 from typing import Optional, Dict, Any, List
 from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import Future
 from flask import Flask, request, jsonify
 
 
 import spacy
 from flask import Flask, request, jsonify
 
-from entity_extraction import extract_ent_sent, clean_text
+import wire
+import entity_extraction
+from model_variants import MODEL_VARIANTS, get_model
+from entity_extraction import extract_ent_sent_batch, screen_disasters, clean_text
+from gazetteer_engine import SupabaseGazetteer, LocalGazetteer, MappedGazetteer
+from gazetteer_artifact import ARTIFACT_SUFFIX
+from fuzzy_index import FuzzyToponymIndex
 
 ### Location standardization setup
 load_dotenv()
 
 url: str = os.environ.get('SUPABASE_URL')
 key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+
+# Location lookups go to Supabase, or with GAZETTEER_BACKEND=local to an in-process index of the
+# GeoNames file (see gazetteer_engine.py), loaded in initialize_globals and needing no credentials.
+# A compiled .gaz artifact (see gazetteer_artifact.py) is memory-mapped instead, preferred when present
+GAZETTEER_BACKEND = os.environ.get("GAZETTEER_BACKEND", "supabase")
+GAZETTEER_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+GAZETTEER_FILE = os.environ.get("GAZETTEER_FILE")
+if not GAZETTEER_FILE:
+    GAZETTEER_FILE = os.path.join(GAZETTEER_DATA_DIR, "US" + ARTIFACT_SUFFIX)
+    if not os.path.exists(GAZETTEER_FILE):
+        GAZETTEER_FILE = os.path.join(GAZETTEER_DATA_DIR, "US.txt")
+# GAZETTEER_FUZZY=1 answers the last lookup stage from an in-process fuzzy index of GAZETTEER_FILE
+# (see fuzzy_index.py) instead of the ilike '%term%' scan, within FUZZY_MAX_EDIT_DISTANCE edits
+GAZETTEER_FUZZY = os.environ.get("GAZETTEER_FUZZY", "0") == "1"
+FUZZY_MAX_EDIT_DISTANCE = int(os.environ.get("FUZZY_MAX_EDIT_DISTANCE", 2))
+supabase: Client = create_client(url, key) if GAZETTEER_BACKEND != "local" else None
+gazetteer_backend = SupabaseGazetteer(supabase) if supabase else None
+fuzzy_index = None
 
 app = Flask(__name__)
 
@@ -100,62 +132,14 @@ state_coordinates = {
 @lru_cache(maxsize=2048)
 def lookup_city_state_country(loc_text: str):
     norm = loc_text.strip()
-    norm_up = norm.upper()
-    norm_title = norm.title()
-    norm_lower = norm.lower()
-
-    # ---------- 1) State code / state name ----------
-    if norm_up in US_STATE_NAMES or norm_title in US_STATE_NAMES.values():
-        # exact ADM1 lookup
-        resp = (
-            supabase.table("gazetteer")
-            .select("name, featureCode, stateCode, countryCode, latitude, longitude")
-            .eq("featureCode", "ADM1")
-            .or_(f"stateCode.eq.{norm_up},name.eq.{norm_title}")
-            .limit(1)
-            .execute()
-        )
-    else:
-        resp = (
-            supabase.table("gazetteer")
-            .select("name, featureCode, stateCode, countryCode, latitude, longitude")
-            .eq("name", norm_title)                     # 2) exact city name
-            .or_("featureCode.ilike.PPL%")
-            .limit(1)
-            .execute()
-        )
-
-        # ---------- 3) alternate_list token match ----------
-        if not resp.data and len(norm) > 2:
-            # alternate_list is a comma‑separated list, so anchor with commas
-            resp = (
-                supabase.table("gazetteer")
-                .select("name, featureCode, stateCode, countryCode, latitude, longitude")
-                .ilike("alternate_list", f"%,{norm_lower},%")
-                .ilike("featureCode", "PPL%")
-                .order("population", desc=True)
-                .limit(1)
-                .execute()
-            )
 
-        # ---------- 4) fuzzy fallback (optional) ----------
-        if not resp.data and len(norm) > 3:
-            resp = (
-                supabase.table("gazetteer")
-                .select("name, featureCode, stateCode, countryCode, latitude, longitude")
-                .ilike("alternate_list", f"%{norm_lower}%")
-                .ilike("featureCode", "PPL%")
-                .order("population", desc=True)
-                .limit(1)
-                .execute()
-            )
-
-    print(resp.data if resp.data else "No data found")
+    # State code / name, exact city name, then alternate_list matches, see gazetteer_engine.match
+    record = gazetteer_backend.match(norm) if gazetteer_backend else None
+    print(record if record else "No data found")
 
     city = state = region = place = state_code = country_code = latitude = longitude = None
 
-    if resp.data:
-        record = resp.data[0]
+    if record:
         feature = (record.get('featureCode') or "").upper()
         place = record.get('name')
         state_code = record.get('stateCode')
@@ -251,6 +235,50 @@ logger = logging.getLogger(__name__)
 
 # Global references to loaded data
 nlp = None
+pipeline_profile = None
+model_variant = None
+sentiment_scorer = None
+
+# Components each load profile leaves out of disaster_ner. extract_ent_sent only reads
+# doc.ents (entity_ruler + ner on the transformer) and doc._.blob.polarity (spacytextblob)
+PIPELINE_PROFILES = {
+    "full": [],
+    "ner+sentiment": ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter"],
+    "ner-only": ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter", "spacytextblob"],
+}
+PIPELINE_PROFILE = os.environ.get("PIPELINE_PROFILE", "full")
+# Which build of the model to serve, see model_variants.py (trf, trf-int8, sm, md)
+MODEL_VARIANT = os.environ.get("MODEL_VARIANT", "trf")
+# Polarity source: "textblob" (spacytextblob in the pipeline) or "batch" (batch_sentiment.py,
+# spacytextblob is then not loaded). Profiles that exclude spacytextblob score no sentiment either way
+SENTIMENT_SCORERS = ("textblob", "batch")
+SENTIMENT_SCORER = os.environ.get("SENTIMENT_SCORER", "textblob")
+# Share of batches that run component by component to measure per-component latency
+COMPONENT_TIMING_SAMPLE = float(os.environ.get("COMPONENT_TIMING_SAMPLE", 0.1))
+
+# Documents per nlp.pipe batch for /extract_entities_batch, and the most texts one request may send
+NLP_BATCH_SIZE = int(os.environ.get("NLP_BATCH_SIZE", 32))
+MAX_BATCH_TEXTS = int(os.environ.get("MAX_BATCH_TEXTS", 1000))
+
+# Single /extract_entities requests are pooled for up to MICRO_BATCH_WAIT_MS (0 disables it)
+MICRO_BATCH_WAIT_MS = float(os.environ.get("MICRO_BATCH_WAIT_MS", 10))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get("MICRO_BATCH_MAX_SIZE", 32))
+
+# extract_ent_sent result cache: memory bound in MB (0 disables), optional TTL and SQLite disk tier
+RESULT_CACHE_MB = float(os.environ.get("RESULT_CACHE_MB", 64))
+RESULT_CACHE_TTL = float(os.environ["RESULT_CACHE_TTL"]) if os.environ.get("RESULT_CACHE_TTL") else None
+RESULT_CACHE_DB = os.environ.get("RESULT_CACHE_DB")
+# Row cap of the disk tier, the oldest rows beyond it are pruned
+RESULT_CACHE_DB_ROWS = int(os.environ.get("RESULT_CACHE_DB_ROWS", 1_000_000))
+
+# Cascade mode: a tokenizer + entity_ruler screen decides which posts get the full model
+NER_CASCADE = os.environ.get("NER_CASCADE", "0") == "1"
+
+# Pre-fork mode: MODEL_WORKERS > 1 forks that many server processes after the model is loaded
+MODEL_WORKERS = int(os.environ.get("MODEL_WORKERS", 1))
+WORKER_THREADS = int(os.environ.get("WORKER_THREADS", 4))
+# torch intra-op threads per worker, so N workers don't each claim every core
+WORKER_TORCH_THREADS = int(os.environ.get("WORKER_TORCH_THREADS", 1))
 
 APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 #print(APP_DIR)
@@ -258,11 +286,31 @@ APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file
 # Initialization Function #
 ###########################
 
-def initialize_globals():
+def initialize_globals(profile=PIPELINE_PROFILE, variant=MODEL_VARIANT, sentiment=SENTIMENT_SCORER):
     """
     Load the spaCy model and gazetteer data once, if not already loaded.
+    `profile` names the PIPELINE_PROFILES entry to load, components it
+    excludes are never loaded. `variant` picks the model build from
+    model_variants.MODEL_VARIANTS and `sentiment` one of SENTIMENT_SCORERS.
     """
-    global nlp
+    global nlp, pipeline_profile, model_variant, sentiment_scorer, gazetteer_backend, fuzzy_index
+
+    if variant not in MODEL_VARIANTS:
+        logger.warning(f"Unknown model variant {variant!r}, loading 'trf'")
+        variant = "trf"
+
+    if profile not in PIPELINE_PROFILES:
+        logger.warning(f"Unknown pipeline profile {profile!r}, loading 'full'")
+        profile = "full"
+    exclude = PIPELINE_PROFILES[profile]
+
+    if sentiment not in SENTIMENT_SCORERS:
+        logger.warning(f"Unknown sentiment scorer {sentiment!r}, using 'textblob'")
+        sentiment = "textblob"
+    if "spacytextblob" in exclude:
+        sentiment = "textblob"
+    elif sentiment == "batch":
+        exclude = exclude + ["spacytextblob"]
 
     logger.info("Initializing model server...")
     process = psutil.Process(os.getpid())
@@ -270,18 +318,58 @@ def initialize_globals():
 
     # 1) Load spaCy Model
     try:
-        nlp_path = os.path.join(os.path.join(APP_DIR, "app", "disaster_ner"))
-        logger.info(f"Loading spaCy model from: {nlp_path}")
-        nlp = spacy.load(nlp_path)
+        nlp_path = MODEL_VARIANTS[variant]["path"]
+        logger.info(f"Loading spaCy model variant '{variant}' from: {nlp_path} with profile '{profile}'")
+        nlp = get_model(variant, exclude)
     except Exception as e:
         logger.error(f"Could not load custom spaCy model from {nlp_path}. Error: {e}")
         logger.info("Falling back to en_core_web_sm (basic model).")
         try:
-            nlp = spacy.load("en_core_web_sm")
+            nlp = spacy.load("en_core_web_sm", exclude=exclude)
+            variant = "en_core_web_sm"
         except Exception as e2:
             logger.error(f"Could not load fallback 'en_core_web_sm': {e2}")
             nlp = None  # If we can’t load anything, set to None
 
+    # Extraction runs on the model loaded here, with this profile's components
+    if nlp is not None:
+        pipeline_profile = profile
+        model_variant = variant
+        sentiment_scorer = sentiment
+        entity_extraction.nlp = nlp
+        entity_extraction.sentiment_scorer = sentiment
+        if sentiment == "batch":
+            # Compile the lexicon now, before any fork, instead of on the first request
+            from batch_sentiment import get_lexicon
+            get_lexicon()
+        entity_extraction.timing_sample_rate = COMPONENT_TIMING_SAMPLE
+        logger.info(f"Pipeline components: {nlp.pipe_names}")
+
+    # 2) Local gazetteer index, instead of Supabase queries
+    if GAZETTEER_BACKEND == "local" and not isinstance(gazetteer_backend, (LocalGazetteer, MappedGazetteer)):
+        try:
+            start = time.time()
+            if GAZETTEER_FILE.endswith(ARTIFACT_SUFFIX):
+                gazetteer_backend = MappedGazetteer.from_file(GAZETTEER_FILE)
+            else:
+                gazetteer_backend = LocalGazetteer.from_file(GAZETTEER_FILE)
+            lookup_city_state_country.cache_clear()
+            logger.info(f"Loaded gazetteer {GAZETTEER_FILE} in {time.time() - start:.3f}s: {gazetteer_backend.stats()}")
+        except Exception as e:
+            logger.error(f"Could not load gazetteer from {GAZETTEER_FILE}, locations won't be standardized. Error: {e}")
+
+    # 3) Fuzzy toponym index for the last lookup stage
+    if GAZETTEER_FUZZY and fuzzy_index is None:
+        try:
+            start = time.time()
+            fuzzy_index = FuzzyToponymIndex.from_file(GAZETTEER_FILE, max_distance=FUZZY_MAX_EDIT_DISTANCE)
+            logger.info(f"Built fuzzy index of {GAZETTEER_FILE} in {time.time() - start:.1f}s: {fuzzy_index.stats()}")
+        except Exception as e:
+            logger.error(f"Could not build fuzzy index from {GAZETTEER_FILE}, using substring lookups. Error: {e}")
+    if gazetteer_backend is not None and gazetteer_backend.fuzzy is not fuzzy_index:
+        gazetteer_backend.fuzzy = fuzzy_index
+        lookup_city_state_country.cache_clear()
+
     # Force garbage collection after loading
     gc.collect() 
 
@@ -289,15 +377,416 @@ def initialize_globals():
 # Utility Functions  #
 ######################
 
-def convert_sets_to_lists(obj):
-    """Convert sets in an object (nested) to lists for JSON serialization."""
-    if isinstance(obj, set):
-        return list(obj)
-    elif isinstance(obj, dict):
-        return {k: convert_sets_to_lists(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_sets_to_lists(item) for item in obj]
-    return obj
+def empty_ent_sent():
+    """Minimal result structure used when no spaCy model is loaded."""
+    return {
+        "disasters": [],
+        "locations": [],
+        "sentiment": "Neutral",
+        "polarity": 0.0
+    }
+
+def standardize_ent_sent(ent_sent):
+    """Add standardized location fields to an extract_ent_sent result, in place."""
+    # Attempt location standardization if gazetteer is loaded
+    if ent_sent['disasters'] and ent_sent['locations']:
+        print(ent_sent['disasters'], ent_sent['locations'])
+        try:
+            loc_series = standardize_row({'locations': ent_sent['locations']})
+            # Update ent_sent with the standardization keys
+            print(loc_series)
+            for key, val in loc_series.items():
+                ent_sent[key] = val
+            
+
+            print("ent sent after standardization:", ent_sent)
+            # De-duplicate the 'locations' list if present
+            if 'locations' in ent_sent and isinstance(ent_sent['locations'], list):
+                ent_sent['locations'] = list(set(ent_sent['locations']))
+        except Exception as e:
+            logger.error(f"Location standardization error: {e}")
+            # Provide fallback
+            ent_sent.update({
+                "city": None,
+                "state": None,
+                "region": None,
+                "country": None,
+                "latitude": None,
+                "longitude": None,
+                "all_locations": []
+            })
+    return ent_sent
+
+################
+# Result Cache #
+################
+
+class ResultCache:
+    """
+    LRU cache of extract_ent_sent results, keyed by a hash of the cleaned
+    text so reposts and bot floods only reach the model once. The key also
+    covers a namespace (see cache_namespace) so results of one model,
+    profile or sentiment scorer are never served under another.
+
+    Results are stored as JSON, which gives every hit a fresh copy and the
+    entry size for the `max_bytes` bound. Entries older than `ttl` seconds
+    count as misses. With `disk_path` an SQLite tier is checked on memory
+    misses and written on every put, so results survive restarts and are
+    shared by pre-forked workers. It keeps at most `disk_max_rows` rows,
+    expired and oldest rows are pruned every `prune_every` written rows.
+
+    Only the memory tier is under `lock`, SQLite is used outside it through
+    one connection per thread, so requests never queue behind disk I/O.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=None, disk_path=None,
+                 disk_max_rows=1_000_000, prune_every=10_000):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.disk_max_rows = disk_max_rows
+        self.prune_every = prune_every
+        self.entries = OrderedDict()  # key -> (created_at, json)
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_pruned': 0}
+        self._local = threading.local()
+        self._prune_lock = threading.Lock()
+        self._written = 0  # rows written since the last prune, this process
+        self._pruned_pid = None
+
+    @staticmethod
+    def key(text, namespace=""):
+        return hashlib.blake2b(f"{namespace}\0{clean_text(text)}".encode('utf-8'), digest_size=16).hexdigest()
+
+    def _expired(self, created_at):
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _connect(self):
+        # One connection per thread, opened lazily so every forked worker gets its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.disk_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ent_sent_cache "
+                "(key TEXT PRIMARY KEY, created_at REAL NOT NULL, result TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ent_sent_cache_created_at ON ent_sent_cache (created_at)")
+            conn.commit()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            # Rows left over from earlier runs are pruned once per process
+            with self._prune_lock:
+                due = self._pruned_pid != os.getpid()
+                self._pruned_pid = os.getpid()
+            if due:
+                self._prune(conn)
+        return conn
+
+    def _prune(self, conn):
+        """Delete expired rows and the oldest ones beyond disk_max_rows."""
+        pruned = 0
+        if self.ttl is not None:
+            pruned += conn.execute(
+                "DELETE FROM ent_sent_cache WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+        if self.disk_max_rows is not None:
+            pruned += conn.execute(
+                "DELETE FROM ent_sent_cache WHERE key IN "
+                "(SELECT key FROM ent_sent_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_rows,)
+            ).rowcount
+        conn.commit()
+        with self.lock:
+            self.counts['disk_pruned'] += pruned
+
+    def _store(self, key, created_at, data):
+        """Insert into the memory tier and evict from the LRU end, the lock must be held."""
+        if key in self.entries:
+            self.bytes -= len(self.entries.pop(key)[1])
+        if len(data) > self.max_bytes:
+            return
+        self.entries[key] = (created_at, data)
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.counts['evictions'] += 1
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and not self._expired(entry[0]):
+                self.entries.move_to_end(key)
+                self.counts['hits'] += 1
+                return json.loads(entry[1])
+
+        row = None
+        if self.disk_path:
+            try:
+                row = self._connect().execute(
+                    "SELECT created_at, result FROM ent_sent_cache WHERE key = ?", (key,)
+                ).fetchone()
+            except Exception as e:
+                logger.error(f"Result cache read failed: {e}")
+
+        with self.lock:
+            if row and not self._expired(row[0]):
+                self._store(key, row[0], row[1])
+                self.counts['disk_hits'] += 1
+                return json.loads(row[1])
+            self.counts['misses'] += 1
+            return None
+
+    def put(self, key, result):
+        self.put_many([(key, result)])
+
+    def put_many(self, items):
+        """Cache (key, result) pairs, written to the disk tier in one transaction."""
+        created_at = time.time()
+        rows = [(key, created_at, json.dumps(result)) for key, result in items]
+        if not rows:
+            return
+        with self.lock:
+            for key, _, data in rows:
+                self._store(key, created_at, data)
+        if not self.disk_path:
+            return
+
+        try:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO ent_sent_cache (key, created_at, result) VALUES (?, ?, ?)", rows
+            )
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Result cache write failed: {e}")
+            return
+
+        with self._prune_lock:
+            self._written += len(rows)
+            due = self._written >= self.prune_every
+            if due:
+                self._written = 0
+        if due:
+            try:
+                self._prune(conn)
+            except Exception as e:
+                logger.error(f"Result cache prune failed: {e}")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counts['hits'] + self.counts['disk_hits'] + self.counts['misses']
+            return {
+                **self.counts,
+                'hit_rate': round((self.counts['hits'] + self.counts['disk_hits']) / lookups, 3) if lookups else None,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'disk_path': self.disk_path,
+                'disk_max_rows': self.disk_max_rows if self.disk_path else None,
+            }
+
+result_cache = ResultCache(
+    int(RESULT_CACHE_MB * 1024 * 1024),
+    RESULT_CACHE_TTL,
+    RESULT_CACHE_DB,
+    RESULT_CACHE_DB_ROWS
+) if RESULT_CACHE_MB > 0 else None
+
+def cache_namespace():
+    """What a cached result depends on besides the text: model variant, pipeline profile, sentiment scorer."""
+    return f"{model_variant}/{pipeline_profile}/{entity_extraction.sentiment_scorer}"
+
+def extract_ent_sent_cached(texts, batch_size=NLP_BATCH_SIZE):
+    """
+    extract_ent_sent_batch behind the result cache. Only texts whose cleaned
+    form isn't cached go through the model, each distinct one once.
+    Returns one result per text in order, or the exception for a failed text.
+    """
+    if result_cache is None:
+        return extract_ent_sent_batch(texts, batch_size)
+
+    namespace = cache_namespace()
+    keys = [result_cache.key(text, namespace) for text in texts]
+    results = {}
+    misses = {}
+    for key, text in zip(keys, texts):
+        if key in results or key in misses:
+            continue
+        cached = result_cache.get(key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            misses[key] = text
+
+    if misses:
+        extracted = extract_ent_sent_batch(list(misses.values()), batch_size)
+        for key, ent_sent in zip(misses, extracted):
+            results[key] = ent_sent
+        # One disk transaction for all of this call's misses
+        result_cache.put_many(
+            (key, ent_sent) for key, ent_sent in zip(misses, extracted) if not isinstance(ent_sent, Exception)
+        )
+
+    # Repeated texts in one call get their own copy, standardize_ent_sent edits in place
+    seen = set()
+    ordered = []
+    for key in keys:
+        result = results[key]
+        if key in seen and not isinstance(result, Exception):
+            result = json.loads(json.dumps(result))
+        seen.add(key)
+        ordered.append(result)
+    return ordered
+
+###########
+# Cascade #
+###########
+
+cascade_counts = {'posts': 0, 'stage1_rejected': 0, 'stage2_posts': 0, 'stage2_no_location': 0}
+cascade_lock = threading.Lock()
+
+def extract_ent_sent_cascade(texts, batch_size=NLP_BATCH_SIZE):
+    """
+    Two-stage extraction. Stage one screens every text for a disaster
+    mention, only the positives go through the full model (and the result
+    cache) for locations and sentiment. Screened-out texts get an empty
+    result, which downstream drops just like a full result without disasters.
+    """
+    flags = screen_disasters(texts)
+    positives = [text for text, flag in zip(texts, flags) if flag]
+    extracted = iter(extract_ent_sent_cached(positives, batch_size) if positives else [])
+    results = [next(extracted) if flag else empty_ent_sent() for flag in flags]
+
+    no_location = sum(
+        1 for flag, result in zip(flags, results)
+        if flag and not isinstance(result, Exception) and not result.get('locations')
+    )
+    with cascade_lock:
+        cascade_counts['posts'] += len(texts)
+        cascade_counts['stage1_rejected'] += len(texts) - len(positives)
+        cascade_counts['stage2_posts'] += len(positives)
+        cascade_counts['stage2_no_location'] += no_location
+    return results
+
+def cascade_stats():
+    with cascade_lock:
+        counts = dict(cascade_counts)
+    counts['stage1_pass_rate'] = round(counts['stage2_posts'] / counts['posts'], 3) if counts['posts'] else None
+    return counts
+
+def run_extraction(texts, batch_size=NLP_BATCH_SIZE):
+    """Entity/sentiment extraction for a list of texts, through the cascade if it is enabled."""
+    if NER_CASCADE:
+        return extract_ent_sent_cascade(texts, batch_size)
+    return extract_ent_sent_cached(texts, batch_size)
+
+####################
+# Request Batching #
+####################
+
+class Histogram:
+    """Fixed-bucket histogram, each bucket counts the observations <= its bound."""
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            i = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+            self.counts[i] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self):
+        with self.lock:
+            labels = [f"<={bound:g}" for bound in self.bounds] + ["+Inf"]
+            return {
+                'buckets': dict(zip(labels, self.counts)),
+                'count': self.count,
+                'mean': round(self.total / self.count, 3) if self.count else None,
+            }
+
+class MicroBatcher:
+    """
+    Pools the texts of concurrent single-text requests and runs them through
+    the model as one batch, so request threads don't each run the model.
+
+    A batch is started as soon as `max_batch_size` texts are waiting or the
+    oldest waiting text has waited `max_wait_ms`. `process_batch(texts)`
+    returns one result per text, or an exception for a text that failed.
+    """
+    def __init__(self, process_batch, max_batch_size=32, max_wait_ms=10):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_waits_ms = Histogram([1, 2, 5, 10, 20, 50, 100, 500])
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def submit(self, text, timeout=60):
+        """Queue one text and block until its result is ready."""
+        self.start()
+        future = Future()
+        self.queue.put((text, time.perf_counter(), future))
+        return future.result(timeout)
+
+    def _collect(self):
+        """Wait for the first text, then gather more until the batch is full or its wait is up."""
+        batch = [self.queue.get()]
+        deadline = batch[0][1] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for _, enqueued_at, _ in batch:
+                self.queue_waits_ms.observe((started - enqueued_at) * 1000)
+            try:
+                results = self.process_batch([text for text, _, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queued': self.queue.qsize(),
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait_ms': self.queue_waits_ms.snapshot(),
+        }
+
+batcher = MicroBatcher(
+    lambda texts: run_extraction(texts, len(texts)),
+    MICRO_BATCH_MAX_SIZE,
+    MICRO_BATCH_WAIT_MS
+) if MICRO_BATCH_WAIT_MS > 0 else None
 
 ###########################
 # Flask Endpoint Handlers #
@@ -310,10 +799,57 @@ def health_check():
     """
     status = {
         'spaCy': 'loaded' if nlp else 'missing',
+        'profile': pipeline_profile,
+        'variant': model_variant,
+        'sentiment': sentiment_scorer,
+        'gazetteer': type(gazetteer_backend).__name__ if gazetteer_backend else 'missing',
+        'fuzzy_index': fuzzy_index is not None,
     }
     # If everything is loaded, we consider it 'healthy'
     overall_state = 'healthy' if (nlp is not None) else 'degraded'
-    return jsonify({'status': overall_state, 'details': status})
+    memory = psutil.Process(os.getpid()).memory_full_info()
+    return jsonify({
+        'status': overall_state,
+        'details': status,
+        'batching': batcher.stats() if batcher else None,
+        'result_cache': {**result_cache.stats(), 'namespace': cache_namespace()} if result_cache else None,
+        'cascade': cascade_stats() if NER_CASCADE else None,
+        # Which worker answered, and how much of its memory isn't shared with the others
+        'worker': {
+            'pid': os.getpid(),
+            'rss_mb': round(memory.rss / 1024 / 1024, 1),
+            'uss_mb': round(memory.uss / 1024 / 1024, 1),
+        },
+    })
+
+@app.route('/component_timings', methods=['GET'])
+def component_timings():
+    """
+    Per-component latency of the loaded pipeline, measured on a sample of
+    live batches. ?reset=1 clears the counters after reading them.
+    """
+    with entity_extraction._timings_lock:
+        timings = {name: list(values) for name, values in entity_extraction.component_timings.items()}
+        if request.args.get('reset') == '1':
+            entity_extraction.component_timings.clear()
+
+    total = sum(seconds for seconds, _, _ in timings.values())
+    components = {
+        name: {
+            'total_ms': round(seconds * 1000, 2),
+            'ms_per_doc': round(seconds * 1000 / docs, 3) if docs else None,
+            'share': round(seconds / total, 3) if total else None,
+            'docs': docs,
+            'batches': batches,
+        }
+        for name, (seconds, docs, batches) in timings.items()
+    }
+    return jsonify({
+        'profile': pipeline_profile,
+        'pipeline': nlp.pipe_names if nlp else [],
+        'sample_rate': entity_extraction.timing_sample_rate,
+        'components': components,
+    })
 
 @app.route('/extract_entities', methods=['POST'])
 def extract_entities():
@@ -322,10 +858,10 @@ def extract_entities():
     """
     start_time = time.time()
 
-    data = request.json or {}
+    data = wire.read_request()
     text = data.get('text', '')
     if not text:
-        return jsonify({'error': 'No text provided'}), 400
+        return wire.respond({'error': 'No text provided'}, 400)
 
     logger.info(f"extract_entities called, text length={len(text)}")
     
@@ -333,66 +869,178 @@ def extract_entities():
     #initialize_globals()
     # Extract using spaCy-based logic or fallback
     if nlp:
-        ent_sent = extract_ent_sent(text)
-        ent_sent = convert_sets_to_lists(ent_sent)
+        # Concurrent requests share one nlp.pipe call through the batcher
+        if batcher:
+            ent_sent = batcher.submit(text)
+        else:
+            ent_sent = run_extraction([text])[0]
+            if isinstance(ent_sent, Exception):
+                raise ent_sent
     else:
         # If no spaCy loaded, return minimal structure
-        ent_sent = {
-            "disasters": [],
-            "locations": [],
-            "sentiment": "Neutral",
-            "polarity": 0.0
-        }
+        ent_sent = empty_ent_sent()
 
     #print("locations in ent sent before standardization (model server): ", ent_sent['locations'])
 
-    # Attempt location standardization if gazetteer is loaded
-    if ent_sent['disasters'] and ent_sent['locations']:
-        print(ent_sent['disasters'], ent_sent['locations'])
-        try:
-            loc_series = standardize_row({'locations': ent_sent['locations']})
-            # Update ent_sent with the standardization keys
-            print(loc_series)
-            for key, val in loc_series.items():
-                ent_sent[key] = val
-            
-
-            print("ent sent after standardization:", ent_sent)
-            # De-duplicate the 'locations' list if present
-            if 'locations' in ent_sent and isinstance(ent_sent['locations'], list):
-                ent_sent['locations'] = list(set(ent_sent['locations']))
-        except Exception as e:
-            logger.error(f"Location standardization error: {e}")
-            # Provide fallback
-            ent_sent.update({
-                "city": None,
-                "state": None,
-                "region": None,
-                "country": None,
-                "latitude": None,
-                "longitude": None,
-                "all_locations": []
-            })
+    standardize_ent_sent(ent_sent)
 
     #print("locations in ent sent after standardization (model server): ", ent_sent['city'], ent_sent['all_locations'])
     elapsed = time.time() - start_time
     logger.info(f"extract_entities completed in {elapsed:.2f}s")
 
-    return jsonify(ent_sent)
+    return wire.respond(ent_sent)
+
+@app.route('/extract_entities_batch', methods=['POST'])
+def extract_entities_batch():
+    """
+    Batched /extract_entities: {"texts": [...], "batch_size": n} -> {"results": [...]}.
+    The texts run through nlp.pipe together, results are in input order and
+    an item that failed (or had no text) is {"error": "..."} instead.
+    Both extraction endpoints also speak MessagePack, see wire.py.
+    """
+    start_time = time.time()
+
+    data = wire.read_request()
+    texts = data.get('texts')
+    if not isinstance(texts, list):
+        return wire.respond({'error': 'No texts provided'}, 400)
+    if len(texts) > MAX_BATCH_TEXTS:
+        return wire.respond({'error': f'Too many texts ({len(texts)} > {MAX_BATCH_TEXTS})'}, 400)
+    batch_size = data.get('batch_size')
+    try:
+        batch_size = NLP_BATCH_SIZE if batch_size is None else int(batch_size)
+    except (TypeError, ValueError):
+        return wire.respond({'error': f'Invalid batch_size {batch_size!r}'}, 400)
+    if not 1 <= batch_size <= MAX_BATCH_TEXTS:
+        return wire.respond({'error': f'batch_size must be between 1 and {MAX_BATCH_TEXTS}, got {batch_size}'}, 400)
+
+    logger.info(f"extract_entities_batch called, {len(texts)} texts, batch_size={batch_size}")
+
+    # Only valid texts go through the model, the rest keep their error slot
+    results = [{'error': 'No text provided'}] * len(texts)
+    valid = [i for i, text in enumerate(texts) if isinstance(text, str) and text]
+    if nlp:
+        extracted = run_extraction([texts[i] for i in valid], batch_size)
+    else:
+        extracted = [empty_ent_sent() for _ in valid]
+
+    for i, ent_sent in zip(valid, extracted):
+        if isinstance(ent_sent, Exception):
+            logger.error(f"Entity extraction error for item {i}: {ent_sent}")
+            results[i] = {'error': str(ent_sent)}
+            continue
+        try:
+            results[i] = standardize_ent_sent(ent_sent)
+        except Exception as e:
+            logger.error(f"Post-processing error for item {i}: {e}")
+            results[i] = {'error': str(e)}
+
+    elapsed = time.time() - start_time
+    logger.info(f"extract_entities_batch completed {len(texts)} texts in {elapsed:.2f}s")
+
+    return wire.respond({'results': results})
 
 ################
 # Main Routine #
 ################
 
+def _init_worker(torch_threads):
+    """Per-process setup in a forked worker."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+def run_prefork(port=5000, workers=2, threads=4, torch_threads=1):
+    """
+    Serve with `workers` forked processes that all accept on one listening
+    socket, so requests are spread over the workers by the kernel.
+
+    Call after initialize_globals(): the model loaded in the parent is
+    shared copy-on-write by the workers. gc.freeze() moves everything loaded
+    so far out of the collector's reach, otherwise its bookkeeping writes
+    would copy those pages into every worker. Dead workers are replaced.
+    """
+    from waitress import serve
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('0.0.0.0', port))
+    sock.listen(1024)
+
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _init_worker(torch_threads)
+                serve(app, sockets=[sock], threads=threads)
+            except Exception as e:
+                logger.critical(f"Worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.time()
+        logger.info(f"Started model worker {pid}")
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for _ in range(workers):
+        spawn()
+    logger.info(f"Model server listening on port {port} with {workers} workers x {threads} threads")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning(f"Model worker {pid} exited with status {status}, restarting")
+        # Don't spin if workers die right after starting
+        if time.time() - started < 1:
+            time.sleep(1)
+        spawn()
+    sock.close()
+
 if __name__ == '__main__':
     # Only do the global initialization if we directly run this file
     initialize_globals()
-    
-    import waitress
+
+    if MODEL_WORKERS > 1 and hasattr(os, 'fork'):
+        try:
+            run_prefork(5000, MODEL_WORKERS, WORKER_THREADS, WORKER_TORCH_THREADS)
+            sys.exit(0)
+        except ImportError:
+            logger.warning("Waitress not installed, pre-fork mode unavailable, serving from one process.")
+        except Exception as e:
+            logger.critical(f"Server failed to start: {e}")
+            sys.exit(1)
+
     logger.info("Starting model server on port 5000 with Waitress")
     try:
         from waitress import serve
-        serve(app, port=5000, threads=4)
+        serve(app, port=5000, threads=WORKER_THREADS)
     except ImportError:
         logger.warning("Waitress not installed, falling back to Flask dev server.")
         app.run(port=5000, threaded=True)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Accuracy-vs-speed report for the disaster_ner model variants.
+
+Runs every variant over the tweet_text of the crisis datasets in data/*.json
+and compares what extract_ent_sent would return (disaster types and
+location strings per post) against the reference variant, usually the full
+transformer model. The datasets have no entity annotations, so F1 is
+agreement with the reference, not with human labels.
+
+    python model_variant_report.py --variants trf trf-int8 sm --limit 500
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+import entity_extraction
+from entity_extraction import clean_text, ent_sent_from_doc
+from model_variants import MODEL_VARIANTS, load_variant
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+
+def load_texts(pattern, limit=None):
+    """Return {dataset name: [tweet texts]} for the JSON datasets matching `pattern`."""
+    datasets = {}
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+        texts = [clean_text(row['tweet_text']) for row in rows if row.get('tweet_text')]
+        datasets[os.path.basename(path).replace('_final_data.json', '')] = texts[:limit] if limit else texts
+    return datasets
+
+def run_variant(nlp, texts, batch_size):
+    """Return the per-text (disasters, locations) sets and the docs/sec."""
+    # ent_sent_from_doc checks the pipeline for spacytextblob
+    entity_extraction.nlp = nlp
+    start = time.perf_counter()
+    results = []
+    for doc in nlp.pipe(texts, batch_size=batch_size):
+        ent_sent = ent_sent_from_doc(doc)
+        results.append((set(ent_sent['disasters']), set(ent_sent['locations'])))
+    elapsed = time.perf_counter() - start
+    return results, len(texts) / elapsed if elapsed else None
+
+def f1(predicted, reference):
+    """Micro precision/recall/F1 over per-text sets."""
+    tp = sum(len(p & r) for p, r in zip(predicted, reference))
+    n_pred = sum(len(p) for p in predicted)
+    n_ref = sum(len(r) for r in reference)
+    precision = tp / n_pred if n_pred else 1.0
+    recall = tp / n_ref if n_ref else 1.0
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variants', nargs='+', default=list(MODEL_VARIANTS), choices=list(MODEL_VARIANTS))
+    parser.add_argument('--reference', default='trf', choices=list(MODEL_VARIANTS))
+    parser.add_argument('--data', default=os.path.join(DATA_DIR, '*.json'), help="Glob of the datasets")
+    parser.add_argument('--limit', type=int, help="Use at most this many posts per dataset")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output', help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    datasets = load_texts(args.data, args.limit)
+    if not datasets:
+        print(f"No datasets match {args.data}")
+        return 1
+    print(f"{sum(map(len, datasets.values()))} posts from {len(datasets)} datasets")
+
+    variants = [args.reference] + [v for v in args.variants if v != args.reference]
+    outputs = {}
+    for variant in variants:
+        try:
+            nlp = load_variant(variant)
+        except Exception as e:
+            print(f"Skipping {variant}: {e}")
+            continue
+        outputs[variant] = {name: run_variant(nlp, texts, args.batch_size) for name, texts in datasets.items()}
+        del nlp
+
+    if args.reference not in outputs:
+        print(f"Reference variant {args.reference} could not be loaded")
+        return 1
+
+    report = {}
+    for variant, per_dataset in outputs.items():
+        for name, (results, docs_per_sec) in per_dataset.items():
+            reference = outputs[args.reference][name][0]
+            report.setdefault(variant, {})[name] = {
+                'docs_per_sec': round(docs_per_sec, 1) if docs_per_sec else None,
+                'disaster_f1': round(f1([r[0] for r in results], [r[0] for r in reference]), 3),
+                'location_f1': round(f1([r[1] for r in results], [r[1] for r in reference]), 3),
+            }
+
+    header = f"{'variant':<10} {'dataset':<24} {'docs/s':>8} {'disaster F1':>12} {'location F1':>12}"
+    print(header)
+    print('-' * len(header))
+    for variant, per_dataset in report.items():
+        for name, row in per_dataset.items():
+            print(f"{variant:<10} {name:<24} {row['docs_per_sec'] or 0:>8.1f} "
+                  f"{row['disaster_f1']:>12.3f} {row['location_f1']:>12.3f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'reference': args.reference, 'variants': report}, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
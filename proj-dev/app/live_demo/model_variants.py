@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Faster CPU variants of the disaster_ner pipeline.
+
+    trf       the transformer-based disaster_ner as trained (reference)
+    trf-int8  disaster_ner with its transformer's Linear layers dynamically
+              quantized to int8 at load time
+    sm / md   en_core_web_sm / en_core_web_md with the same entity_ruler
+              disaster patterns and spacytextblob, built once with
+                  python model_variants.py build sm
+
+model_server picks one through MODEL_VARIANT, see initialize_globals().
+Compare them with model_variant_report.py. get_model() is the registry
+that keeps one loaded instance per variant for the whole process.
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+
+import spacy
+import spacytextblob.spacytextblob  # registers the "spacytextblob" factory the pipelines use
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DISASTER_TYPES_FILE = os.path.join(APP_DIR, "..", "data", "disasters", "disaster_types.json")
+
+MODEL_VARIANTS = {
+    "trf": {"path": os.path.join(APP_DIR, "disaster_ner"), "quantize": False},
+    "trf-int8": {"path": os.path.join(APP_DIR, "disaster_ner"), "quantize": True},
+    "sm": {"path": os.path.join(APP_DIR, "disaster_ner_sm"), "base": "en_core_web_sm", "quantize": False},
+    "md": {"path": os.path.join(APP_DIR, "disaster_ner_md"), "base": "en_core_web_md", "quantize": False},
+}
+
+def disaster_patterns(nlp, path=DISASTER_TYPES_FILE):
+    """
+    Build the DISASTER entity_ruler patterns from disaster_types.json the way
+    dataset_test.ipynb does: one case-insensitive, optionally plural regex
+    per lemma of every synonym, with the disaster type as the pattern id.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        disasters = json.load(f)["disasters"]
+
+    patterns = []
+    for label, synonyms in disasters.items():
+        for syn in synonyms:
+            pattern_tokens = [
+                {"TEXT": {"REGEX": fr"(?i)^{token.lemma_.lower()}s?$"}}
+                for token in nlp(syn)
+            ]
+            patterns.append({"label": "DISASTER", "pattern": pattern_tokens, "id": label})
+    return patterns
+
+def build_cnn_variant(name):
+    """
+    Build the `name` variant on its small CNN base model. The disaster
+    patterns are copied from the trained disaster_ner when it is available,
+    so both pipelines find exactly the same disasters.
+    """
+    variant = MODEL_VARIANTS[name]
+    nlp = spacy.load(variant["base"])
+
+    try:
+        source = spacy.load(MODEL_VARIANTS["trf"]["path"], exclude=["transformer", "tagger", "parser", "ner"])
+        patterns = source.get_pipe("entity_ruler").patterns
+        print(f"Copied {len(patterns)} patterns from {MODEL_VARIANTS['trf']['path']}")
+    except Exception as e:
+        print(f"Could not copy patterns from disaster_ner ({e}), rebuilding them from {DISASTER_TYPES_FILE}")
+        patterns = disaster_patterns(nlp)
+
+    ruler = nlp.add_pipe("entity_ruler", before="ner")
+    ruler.add_patterns(patterns)
+    nlp.add_pipe("spacytextblob")
+
+    nlp.to_disk(variant["path"])
+    print(f"Saved {name} variant with {len(ruler.patterns)} patterns to {variant['path']}")
+    return variant["path"]
+
+def quantize_transformer(nlp):
+    """
+    Dynamically quantize the Linear layers of every PyTorch model wrapped in
+    the pipeline (the transformer) to int8, in place. Returns how many
+    models were quantized.
+    """
+    import torch
+
+    quantized = 0
+    for name, proc in nlp.pipeline:
+        model = getattr(proc, 'model', None)
+        if model is None or not hasattr(model, 'walk'):
+            continue
+        for node in model.walk():
+            for shim in node.shims:
+                torch_model = getattr(shim, '_model', None)
+                if isinstance(torch_model, torch.nn.Module):
+                    shim._model = torch.quantization.quantize_dynamic(
+                        torch_model, {torch.nn.Linear}, dtype=torch.qint8
+                    )
+                    quantized += 1
+    return quantized
+
+def load_variant(name="trf", exclude=()):
+    """Load a model variant, leaving out the `exclude` components."""
+    if name not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant {name!r}, choose from {list(MODEL_VARIANTS)}")
+    variant = MODEL_VARIANTS[name]
+    nlp = spacy.load(variant["path"], exclude=list(exclude))
+    if variant["quantize"]:
+        if not quantize_transformer(nlp):
+            print(f"Variant {name}: no PyTorch model found to quantize")
+    return nlp
+
+# Loaded pipelines by (variant, excluded components)
+_models = {}
+_models_lock = threading.Lock()
+
+def get_model(name="trf", exclude=()):
+    """
+    The process-wide instance of a variant: loaded on the first call, the
+    same object for every later caller asking for the same components.
+    """
+    key = (name, tuple(sorted(exclude)))
+    with _models_lock:
+        if key not in _models:
+            _models[key] = load_variant(name, exclude)
+        return _models[key]
+
+def main():
+    parser = argparse.ArgumentParser(description="Build disaster_ner model variants.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="Build a CNN-based variant")
+    build.add_argument('variant', choices=[n for n, v in MODEL_VARIANTS.items() if 'base' in v])
+    args = parser.parse_args()
+
+    build_cnn_variant(args.variant)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
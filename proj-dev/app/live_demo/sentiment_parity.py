@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Parity check of batch_sentiment against TextBlob, which spacytextblob uses
+for doc._.blob.polarity, on the tweet_text of the datasets in data/*.json.
+
+Both score the clean_text output, like extract_ent_sent does. Prints the
+largest polarity difference, how many Negative/Neutral/Positive labels
+differ and the time each scorer took. Exits 1 if any label differs.
+
+    python sentiment_parity.py --limit 2000
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+from textblob import TextBlob
+
+from entity_extraction import clean_text, sentiment_label
+from batch_sentiment import batch_polarity, get_lexicon
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+
+def load_texts(pattern, limit=None):
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = [row for row in json.load(f) if row.get('tweet_text')]
+        texts.extend(clean_text(row['tweet_text']) for row in rows[:limit])
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=os.path.join(DATA_DIR, '*.json'), help="Glob of the datasets")
+    parser.add_argument('--limit', type=int, help="Use at most this many posts per dataset")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--tolerance', type=float, default=1e-9, help="Largest polarity difference counted as equal")
+    parser.add_argument('--show', type=int, default=10, help="Print this many mismatching texts")
+    args = parser.parse_args()
+
+    texts = load_texts(args.data, args.limit)
+    if not texts:
+        print(f"No datasets match {args.data}")
+        return 1
+
+    start = time.perf_counter()
+    reference = [TextBlob(text).polarity for text in texts]
+    textblob_seconds = time.perf_counter() - start
+
+    get_lexicon()  # compiled once per process, not part of the per-batch cost
+    start = time.perf_counter()
+    scores = []
+    for i in range(0, len(texts), args.batch_size):
+        scores.extend(batch_polarity(texts[i:i + args.batch_size]))
+    batch_seconds = time.perf_counter() - start
+
+    diffs = [abs(a - b) for a, b in zip(reference, scores)]
+    mismatches = [i for i, d in enumerate(diffs) if d > args.tolerance]
+    label_mismatches = [i for i in mismatches if sentiment_label(reference[i]) != sentiment_label(scores[i])]
+
+    print(f"{len(texts)} posts")
+    print(f"TextBlob: {textblob_seconds:.2f}s ({len(texts) / textblob_seconds:.0f} posts/s)")
+    print(f"Batch:    {batch_seconds:.2f}s ({len(texts) / batch_seconds:.0f} posts/s), "
+          f"{textblob_seconds / batch_seconds:.1f}x")
+    print(f"Max polarity difference: {max(diffs):.3g}, {len(mismatches)} above {args.tolerance:g}")
+    print(f"Sentiment label differences: {len(label_mismatches)}")
+    for i in mismatches[:args.show]:
+        print(f"  {reference[i]:+.4f} vs {scores[i]:+.4f}: {texts[i]!r}")
+    return 1 if label_mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""
+Request validation of model_server's /extract_entities_batch.
+
+    cd proj-dev/app/live_demo && python -m pytest -q test_extract_entities_batch.py
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("spacy")
+pytest.importorskip("supabase")
+pytest.importorskip("dotenv")
+
+os.environ.setdefault("GAZETTEER_BACKEND", "local")
+
+import model_server
+
+@pytest.fixture
+def client(monkeypatch):
+    # Without a model the endpoint answers with empty results, no spaCy load needed
+    monkeypatch.setattr(model_server, "nlp", None)
+    return model_server.app.test_client()
+
+@pytest.mark.parametrize("batch_size", ["abc", -1, 0, model_server.MAX_BATCH_TEXTS + 1, [4]])
+def test_invalid_batch_size_is_rejected(client, batch_size):
+    response = client.post('/extract_entities_batch', json={'texts': ["Flooding in Houston"], 'batch_size': batch_size})
+    assert response.status_code == 400
+    assert 'batch_size' in response.get_json()['error']
+
+@pytest.mark.parametrize("payload", [{}, {'batch_size': 4}, {'batch_size': "8"}])
+def test_valid_batch_size_returns_every_result(client, payload):
+    response = client.post('/extract_entities_batch', json={'texts': ["Flooding in Houston", "Fire"], **payload})
+    assert response.status_code == 200
+    assert all('error' not in result for result in response.get_json()['results'])
@@ -0,0 +1,117 @@
+"""
+Result cache keys of model_server: results of one pipeline profile, model
+variant or sentiment scorer are never served under another.
+
+    cd proj-dev/app/live_demo && python -m pytest -q test_result_cache.py
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+import pytest
+
+pytest.importorskip("spacy")
+pytest.importorskip("supabase")
+pytest.importorskip("dotenv")
+
+os.environ.setdefault("GAZETTEER_BACKEND", "local")
+
+import model_server
+from model_server import ResultCache
+
+TEXTS = ["Flooding on Main St in Houston, TX", "flooding on main st in houston tx", "All quiet here"]
+
+def fake_extract(calls):
+    """extract_ent_sent_batch stand-in, its polarity tells which profile and scorer produced it."""
+    def extract(texts, batch_size=None):
+        calls.append(list(texts))
+        polarity = 0.0 if model_server.pipeline_profile == "ner-only" else -0.5
+        return [{
+            'profile': model_server.pipeline_profile,
+            'scorer': model_server.entity_extraction.sentiment_scorer,
+            'sentiment': {'polarity': polarity},
+        } for _ in texts]
+    return extract
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = ResultCache(1024 * 1024, None, str(tmp_path / "cache.sqlite"))
+    calls = []
+    monkeypatch.setattr(model_server, "result_cache", cache)
+    monkeypatch.setattr(model_server, "extract_ent_sent_batch", fake_extract(calls))
+    monkeypatch.setattr(model_server, "model_variant", "trf")
+    monkeypatch.setattr(model_server, "pipeline_profile", "full")
+    monkeypatch.setattr(model_server.entity_extraction, "sentiment_scorer", "textblob")
+    return cache, calls
+
+def test_repeated_text_is_served_from_cache(cache):
+    _, calls = cache
+    first = model_server.extract_ent_sent_cached(TEXTS)
+    second = model_server.extract_ent_sent_cached(TEXTS)
+    assert first == second
+    assert len(calls) == 1
+
+def test_profile_switch_shares_no_result(cache, monkeypatch):
+    result_cache, calls = cache
+    full = model_server.extract_ent_sent_cached(TEXTS)
+
+    monkeypatch.setattr(model_server, "pipeline_profile", "ner-only")
+    ner_only = model_server.extract_ent_sent_cached(TEXTS)
+    assert len(calls) == 2
+    assert all(result['profile'] == "ner-only" for result in ner_only)
+    assert all(result['sentiment']['polarity'] == 0.0 for result in ner_only)
+
+    # Neither the memory tier nor a fresh process reading the SQLite tier mixes them up
+    monkeypatch.setattr(model_server, "pipeline_profile", "full")
+    assert model_server.extract_ent_sent_cached(TEXTS) == full
+    monkeypatch.setattr(model_server, "result_cache", ResultCache(1024 * 1024, None, result_cache.disk_path))
+    monkeypatch.setattr(model_server, "pipeline_profile", "ner-only")
+    assert model_server.extract_ent_sent_cached(TEXTS) == ner_only
+    assert len(calls) == 2
+
+@pytest.mark.parametrize("attribute, value", [("model_variant", "sm"), ("sentiment_scorer", "batch")])
+def test_variant_and_scorer_switch_miss(cache, monkeypatch, attribute, value):
+    _, calls = cache
+    model_server.extract_ent_sent_cached(TEXTS)
+    target = model_server.entity_extraction if attribute == "sentiment_scorer" else model_server
+    monkeypatch.setattr(target, attribute, value)
+    model_server.extract_ent_sent_cached(TEXTS)
+    assert len(calls) == 2
+
+def test_misses_are_written_in_one_transaction(cache, monkeypatch):
+    result_cache, _ = cache
+    batches = []
+    put_many = result_cache.put_many
+    monkeypatch.setattr(result_cache, "put_many", lambda items: batches.append(list(items)) or put_many(batches[-1]))
+    model_server.extract_ent_sent_cached([f"text {i}" for i in range(64)])
+    assert [len(batch) for batch in batches] == [64]
+
+    fresh = ResultCache(1024 * 1024, None, result_cache.disk_path)
+    namespace = model_server.cache_namespace()
+    assert all(fresh.get(ResultCache.key(f"text {i}", namespace)) is not None for i in range(64))
+
+def test_disk_tier_keeps_the_newest_rows(tmp_path):
+    cache = ResultCache(1024 * 1024, None, str(tmp_path / "cache.sqlite"), disk_max_rows=5, prune_every=1)
+    for i in range(10):
+        cache.put(f"key {i}", {'i': i})
+    conn = sqlite3.connect(cache.disk_path)
+    assert sorted(key for (key,) in conn.execute("SELECT key FROM ent_sent_cache")) == [f"key {i}" for i in range(5, 10)]
+    assert cache.stats()['disk_pruned'] == 5
+
+def test_memory_hits_do_not_wait_for_the_disk(tmp_path):
+    cache = ResultCache(1024 * 1024, None, str(tmp_path / "cache.sqlite"))
+    cache.put("cached", {'hit': True})
+
+    # Another process holds the write lock, so the next put waits on SQLite
+    blocker = sqlite3.connect(cache.disk_path)
+    blocker.execute("BEGIN EXCLUSIVE")
+    writer = threading.Thread(target=cache.put, args=("new", {'hit': False}))
+    writer.start()
+    time.sleep(0.2)
+    start = time.perf_counter()
+    assert cache.get("cached") == {'hit': True}
+    assert time.perf_counter() - start < 0.1
+    blocker.rollback()
+    writer.join()
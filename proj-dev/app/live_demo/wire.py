@@ -0,0 +1,68 @@
+"""
+Body encoding for the calls between entry.py and model_server.
+
+Both sides speak MessagePack when the msgpack package is installed and fall
+back to JSON when it isn't: the client sends a MessagePack body with an
+Accept header preferring it, the server answers in the best type the client
+accepts (JSON for a plain */*) and rejects a body it can't read with 415,
+after which the client switches to JSON.
+"""
+
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+
+def _default(obj):
+    # The one place sets in a payload become lists, for both encodings
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Cannot encode {type(obj).__name__}")
+
+def available_mimetypes():
+    """Encodings this process can read and write, JSON first so it wins ties."""
+    return [JSON_MIMETYPE, MSGPACK_MIMETYPE] if msgpack else [JSON_MIMETYPE]
+
+def preferred_mimetype():
+    return MSGPACK_MIMETYPE if msgpack else JSON_MIMETYPE
+
+def accept_header():
+    return f"{MSGPACK_MIMETYPE}, {JSON_MIMETYPE};q=0.9" if msgpack else JSON_MIMETYPE
+
+def dumps(obj, mimetype=JSON_MIMETYPE):
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+def loads(data, mimetype=JSON_MIMETYPE):
+    """Decode a body, `mimetype` may be a full Content-Type header."""
+    if mimetype and mimetype.split(';')[0].strip() == MSGPACK_MIMETYPE:
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+def read_request():
+    """The body of the current Flask request as a dict; aborts with 415/400 if unreadable."""
+    from flask import request, abort
+
+    if request.mimetype == MSGPACK_MIMETYPE:
+        if msgpack is None:
+            abort(415)
+        try:
+            data = msgpack.unpackb(request.get_data(), raw=False)
+        except Exception:
+            abort(400)
+    else:
+        data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+def respond(obj, status=200):
+    """A Flask response in the best encoding the client's Accept header allows."""
+    from flask import Response, request
+
+    mimetype = request.accept_mimetypes.best_match(available_mimetypes(), default=JSON_MIMETYPE)
+    return Response(dumps(obj, mimetype), status=status, mimetype=mimetype)
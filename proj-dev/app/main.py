@@ -1,12 +1,12 @@
 import pandas as pd
 import spacy
-from gazetteer import load_gazetteer, build_location_dict, lookup_city_state_country
+from gazetteer import load_gazetteer, build_location_index, lookup_location
 from entity_extraction import extract_ent_sent, clean_text
 
 nlp = spacy.load("disaster_ner")
 
 gazetteer_df = load_gazetteer("../data/US.txt")
-location_dict = build_location_dict(gazetteer_df)
+location_index = build_location_index(gazetteer_df)
 
 def process_tweet(text):
     """
@@ -27,7 +27,7 @@ def process_tweet(text):
 
     # Perform a location lookup on the first extracted location (if available)
     if ent_sent["locations"]:
-        lookup_result = lookup_city_state_country(ent_sent["locations"][0], gazetteer_df, location_dict)
+        lookup_result = lookup_location(ent_sent["locations"][0], location_index)
     else:
         lookup_result = {"city": None, "state": None, "region": None, "country": None}
 